@@ -1,10 +1,30 @@
 from pathlib import Path
-import subprocess
+from collections import namedtuple
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
 
 #=======================
 #         MAIN
 #=======================
 
+# Runs the pipeline as a dependency graph of stages. Each stage is a function
+# imported from scripts/, executed in a pool of worker processes, so imports
+# are paid once per worker instead of once per script. A stage starts as soon
+# as every stage it depends on has finished; independent stages (the six
+# visualizations) run in parallel. Stages downstream of a failure are skipped.
+# Query results are handed to the visualizations as DataFrames, so nothing is
+# written to and parsed back from results/*.csv in between (use --no-csv to
+# skip the CSV side output entirely).
+# Every run writes a JSON report of each stage's time, memory, rows, bytes and
+# API calls to reports/ (see scripts/instrumentation.py).
+
 
 # Set project root directory dynamically
 try:
@@ -14,35 +34,178 @@ except NameError:
 
 if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
-    
+
 # Define the scripts directory
 SCRIPTS_DIR = BASE_DIR / "scripts"
+REPORTS_DIR = BASE_DIR / "reports"
+
+# Stage modules are imported from scripts/, here and in the worker processes
+sys.path.insert(0, str(SCRIPTS_DIR))
+import instrumentation
+from render_figures import VISUALIZATIONS
+
+# `input` is (stage, key): the stage's function gets that entry of the
+# stage's return value as its `df` argument
+Stage = namedtuple("Stage", ["module", "function", "depends_on", "input"], defaults=[None])
+
+def pipeline_stages():
+    """{stage name: Stage} for the full pipeline."""
+    stages = {
+        # fetch_all already fetches the five endpoint families concurrently
+        # through one shared rate limiter, so it is a single stage
+        "fetch": Stage("fetch_all", "main", []),
+        "load": Stage("load_to_db", "main", ["fetch"]),
+        "queries": Stage("run_queries", "main", ["load"]),
+    }
+    for name, result_name in VISUALIZATIONS.items():
+        stages[name] = Stage(name, "main", ["queries"], ("queries", result_name))
+    return stages
+
+
+def run_stage(stage, kwargs, profile_path=None, trace_memory=False):
+    """Import a stage's module from scripts/ and call its function. Returns (its result, its metrics)."""
+    module = importlib.import_module(stage.module)
+    return instrumentation.measure(getattr(module, stage.function), kwargs,
+                                   profile_path=profile_path, trace_memory=trace_memory)
+
+
+def blocked_stages(stages, pending, failed):
+    """Pending stages that depend on a failed or skipped stage."""
+    return [name for name in pending if any(dep in failed for dep in stages[name].depends_on)]
+
+
+def ready_stages(stages, pending, finished):
+    return [name for name in pending if all(dep in finished for dep in stages[name].depends_on)]
+
+
+def run_pipeline(stages, stage_kwargs=None, workers=None, serial=False, profile_stage=None, trace_memory=False):
+    """Run `stages` in dependency order. Returns {stage: {"status": "ok" | "failed" | "skipped", metrics...}}.
+
+    Stages run on a process pool, or one after another in this process with
+    `serial` (e.g. for debugging in Spyder). `profile_stage` is run under
+    cProfile, with the stats saved to reports/<stage>.prof.
+    """
+    stage_kwargs = stage_kwargs or {}
+    pending = list(stages)
+    finished, failed = set(), set()
+    report = {}
+    outputs = {}
+    running = {}
+
+    def record(name, outcome):
+        try:
+            output, metrics = outcome()
+        except Exception as e:
+            failed.add(name)
+            report[name] = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            print(f"Stage {name} failed:\n{traceback.format_exc()}")
+        else:
+            finished.add(name)
+            if output is not None:
+                outputs[name] = output
+            report[name] = {"status": "ok", **metrics}
+            print(f"Finished {name} in {metrics['wall_s']:.2f}s")
+
+    def stage_args(name):
+        profile_path = str(REPORTS_DIR / f"{name}.prof") if name == profile_stage else None
+        kwargs = dict(stage_kwargs.get(name, {}))
+        if stages[name].input is not None:
+            source, key = stages[name].input
+            kwargs["df"] = outputs[source][key]
+        return stages[name], kwargs, profile_path, trace_memory
+
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Figures are rendered off-screen, without show()
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in blocked_stages(stages, pending, failed):
+                pending.remove(name)
+                failed.add(name)
+                report[name] = {"status": "skipped"}
+                print(f"Skipped {name}: a stage it depends on did not finish")
+
+            for name in ready_stages(stages, pending, finished):
+                pending.remove(name)
+                print(f"\nRunning {name}\n")
+                if serial:
+                    record(name, lambda: run_stage(*stage_args(name)))
+                else:
+                    running[pool.submit(run_stage, *stage_args(name))] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                record(running.pop(future), future.result)
+
+    print(f"\nPipeline finished in {time.perf_counter() - start:.2f}s")
+    for name in stages:
+        entry = report.get(name, {"status": "not run"})
+        details = ""
+        if entry["status"] == "ok":
+            details = (f"{entry['wall_s']:>7.2f}s wall {entry['cpu_s']:>7.2f}s cpu "
+                       f"{entry['peak_rss_mb'] or 0:>7.1f} MB peak {entry['rows_in']:>9,} rows in {entry['rows_out']:>9,} out")
+        print(f"  {name:<42} {entry['status']:<8} {details}")
+
+    if profile_stage in finished:
+        print(f"\nProfile of {profile_stage} ({REPORTS_DIR / f'{profile_stage}.prof'}):")
+        print(instrumentation.profile_summary(REPORTS_DIR / f"{profile_stage}.prof"))
+    return report
+
+
+def save_report(report, path, total_wall_s, workers, serial):
+    """Write the run report as JSON and return its path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "total_wall_s": round(total_wall_s, 3),
+            "workers": "serial" if serial else (workers or os.cpu_count()),
+            "stages": report,
+        }, file, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the full fetch, load, query and visualization pipeline.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: the number of CPUs)")
+    parser.add_argument("--serial", action="store_true",
+                        help="run all stages one after another in this process")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fetch only new price days and upsert only changed data files")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the symbol universe into this many shards for parallel fetching and full loads")
+    parser.add_argument("--engine", choices=["sql", "pandas"], default="sql",
+                        help="compute the query results with SQL (default) or in memory with pandas")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="hand query results to the figures without saving them to results/")
+    parser.add_argument("--formats", nargs="+", default=["png"], help="figure formats, e.g. png svg pdf")
+    parser.add_argument("--dpi", type=int, default=300, help="figure resolution (default: 300)")
+    parser.add_argument("--report", default=None,
+                        help="path of the JSON run report (default: reports/run_<timestamp>.json)")
+    parser.add_argument("--profile", metavar="STAGE", choices=list(pipeline_stages()), default=None,
+                        help="run STAGE under cProfile and save the stats to reports/STAGE.prof")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record the tracemalloc allocation peak of each stage (slower)")
+    args = parser.parse_args()
 
-script_files = [
-    "fetch_balance_sheets.py",
-    "fetch_company_overviews.py",
-    "fetch_earnings.py",
-    "fetch_income_statements.py",
-    "fetch_stock_prices.py",
-    "load_to_db.py",
-    "run_queries.py",
-    "visualize_earnings_surprise_vs_price.py",
-    "visualize_monthly_net_2pct_gain_counts.py",
-    "visualize_post_earnings_drift.py",
-    "visualize_profitability_ratios_annual.py",
-    "visualize_stock_volatility.py",
-    "visualize_valuation_multiples.py"
-]
-
-for script_file in script_files:
-    script_path = SCRIPTS_DIR / script_file
-    print(f"\nRunning {script_file}\n")
-    try:
-        subprocess.run(
-            ["python", str(script_path)],
-            check=True,
-        )
-        print(f"Finished {script_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"Script {script_file} failed with error code: {e.returncode}")
-        continue
+    stage_kwargs = {
+        "fetch": {"incremental": args.incremental, "shards": args.shards},
+        # Incremental loads upsert into the existing database and are not sharded
+        "load": {"incremental": args.incremental, "shards": 1 if args.incremental else args.shards},
+        "queries": {"engine": args.engine, "save_csv": not args.no_csv},
+    }
+    for name in VISUALIZATIONS:
+        stage_kwargs[name] = {"formats": args.formats, "dpi": args.dpi, "show": False}
+    start = time.perf_counter()
+    report = run_pipeline(pipeline_stages(), stage_kwargs, workers=args.workers, serial=args.serial,
+                          profile_stage=args.profile, trace_memory=args.trace_memory)
+    report_path = args.report or REPORTS_DIR / f"run_{datetime.now():%Y%m%d_%H%M%S}.json"
+    print(f"Run report saved to {save_report(report, report_path, time.perf_counter() - start, args.workers, args.serial)}")
+    raise SystemExit(0 if all(entry["status"] == "ok" for entry in report.values()) else 1)
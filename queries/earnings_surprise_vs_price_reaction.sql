@@ -2,27 +2,20 @@
 -- last 20 quarters. Surprise is calculated as the percent difference between
 -- reported and estimated EPS. Stock return reflects the percentage change in 
 -- closing price from the report date to five trading days later. 
+-- Trading-day offsets use stock_prices.trading_day, numbered per symbol by
+-- the loader, so each offset is an index lookup.
 
-WITH stock_prices_rows AS (
-    SELECT
-	    symbol,
-		date,
-		close,
-		ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date) AS stock_rn
-	FROM
-	    stock_prices
-),
-earnings_rows AS (
+WITH earnings_rows AS (
     SELECT
 	    e.symbol,
 		e.fiscal_quarter,
 		e.reported_date,
 		e.surprise_pct,
-		s.stock_rn AS earnings_rn 
+		s.trading_day AS earnings_day 
 	FROM
 	    quarterly_earnings AS e
 	JOIN
-	    stock_prices_rows AS s ON e.symbol=s.symbol AND e.reported_date=s.date		
+	    stock_prices AS s ON e.symbol=s.symbol AND e.reported_date=s.date		
 )
 SELECT
     e.symbol,
@@ -36,9 +29,9 @@ SELECT
 FROM
     earnings_rows AS e
 JOIN
-    stock_prices_rows AS s0 ON e.symbol=s0.symbol AND e.earnings_rn=s0.stock_rn
+    stock_prices AS s0 ON e.symbol=s0.symbol AND e.earnings_day=s0.trading_day
 JOIN
-    stock_prices_rows AS s5 ON e.symbol=s5.symbol AND e.earnings_rn+5=s5.stock_rn
+    stock_prices AS s5 ON e.symbol=s5.symbol AND e.earnings_day+5=s5.trading_day
 JOIN
    company_overviews AS c ON e.symbol=c.symbol
 WHERE
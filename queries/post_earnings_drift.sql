@@ -3,27 +3,20 @@
 -- grouped by surprise direction (positive vs. negative) to identify whether 
 -- stocks tend to continue drifting in the direction of the earnings surprise 
 -- after the initial reaction.
+-- Trading-day offsets use stock_prices.trading_day, numbered per symbol by
+-- the loader, so each offset is an index lookup.
 
-WITH stock_prices_rows AS (
-    SELECT
-	    symbol,
-		date,
-		close,
-		ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date) AS stock_rn
-	FROM
-	    stock_prices
-),
-earnings_rows AS (
+WITH earnings_rows AS (
     SELECT
 	    e.symbol,
 		e.fiscal_quarter,
 		e.reported_date,
 		e.surprise_pct,
-		s.stock_rn AS earnings_rn 
+		s.trading_day AS earnings_day 
 	FROM
 	    quarterly_earnings AS e
 	JOIN
-	    stock_prices_rows AS s ON e.symbol=s.symbol AND e.reported_date=s.date		
+	    stock_prices AS s ON e.symbol=s.symbol AND e.reported_date=s.date		
 )
 SELECT
     e.symbol,
@@ -38,9 +31,9 @@ SELECT
 FROM
     earnings_rows AS e
 JOIN
-    stock_prices_rows AS s6 ON e.symbol=s6.symbol AND e.earnings_rn+6=s6.stock_rn
+    stock_prices AS s6 ON e.symbol=s6.symbol AND e.earnings_day+6=s6.trading_day
 JOIN
-    stock_prices_rows AS s20 ON e.symbol=s20.symbol AND e.earnings_rn+20=s20.stock_rn
+    stock_prices AS s20 ON e.symbol=s20.symbol AND e.earnings_day+20=s20.trading_day
 JOIN
    company_overviews AS c ON e.symbol=c.symbol
 WHERE
@@ -2,29 +2,30 @@
 -- closing price after each fiscal year end, combined with fundamentals from the
 -- corresponding annual income statements and balance sheets. Useful for comparing
 -- relative valuation across companies and time.
+-- The price date is an as-of lookup: MIN(date) after the fiscal year end is a
+-- single seek into the (symbol, date) primary key of stock_prices per report.
 
-WITH dated_prices AS (
+WITH annual_reports AS (
     SELECT
-       s.symbol,
-	    s.date,
-	    s.close,
+	    i.symbol,
 	    i.netIncome,
 	    i.totalRevenue,
 	    b.totalShareholderEquity,
 	    b.commonStockSharesOutstanding,
-	    ROW_NUMBER() OVER (PARTITION BY s.symbol, i.fiscal_date ORDER BY s.date) AS rn
-    FROM stock_prices AS s
-    JOIN income_statements AS i ON s.symbol=i.symbol AND s.date > i.fiscal_date
-    JOIN balance_sheets AS b ON s.symbol=b.symbol AND i.fiscal_date = b.fiscal_date
+	    (SELECT MIN(p.date)
+	     FROM stock_prices AS p
+	     WHERE p.symbol = i.symbol AND p.date > i.fiscal_date) AS price_date
+    FROM income_statements AS i
+    JOIN balance_sheets AS b ON i.symbol=b.symbol AND i.fiscal_date = b.fiscal_date
     WHERE i.report_type = 'annual' AND b.report_type = 'annual'
 )
 SELECT
     d.symbol,
     c.Name AS company_name,
-	 d.date AS price_date,
-	 ROUND(d.close / (d.netIncome * 1.0 / d.commonStockSharesOutstanding),2) AS PE,
-	 ROUND(d.close / (d.totalRevenue * 1.0 / d.commonStockSharesOutstanding),2) AS PS,
-	 ROUND(d.close / (d.totalShareholderEquity * 1.0 / d.commonStockSharesOutstanding),2) AS PB
-FROM dated_prices AS d
+	 d.price_date,
+	 ROUND(s.close / (d.netIncome * 1.0 / d.commonStockSharesOutstanding),2) AS PE,
+	 ROUND(s.close / (d.totalRevenue * 1.0 / d.commonStockSharesOutstanding),2) AS PS,
+	 ROUND(s.close / (d.totalShareholderEquity * 1.0 / d.commonStockSharesOutstanding),2) AS PB
+FROM annual_reports AS d
+JOIN stock_prices AS s ON d.symbol = s.symbol AND d.price_date = s.date
 JOIN company_overviews AS c ON d.symbol = c.symbol
-WHERE d.rn = 1
\ No newline at end of file
@@ -0,0 +1,271 @@
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import storage
+from compact_dtypes import CATEGORY_DTYPES, as_float64, compact_frame, day_numbers, iso_dates, iso_months
+
+#==================================================
+#            IN-MEMORY ANALYTICS ENGINE
+#==================================================
+
+# Vectorized pandas/NumPy versions of the queries in queries/. Each function
+# takes the frames returned by load_frames() and returns the same columns as
+# the SQL query of the same name. run_queries.py selects this engine with
+# `--engine pandas` and compares both engines with `--check-parity`.
+
+# Columns read per dataset, so columnar storage only decodes what is needed
+FRAME_COLUMNS = {
+    "stock_prices": ["symbol", "date", "open", "close"],
+    "quarterly_earnings": ["symbol", "fiscal_quarter", "reported_date", "surprise_pct"],
+    "income_statements": ["symbol", "report_type", "fiscal_date", "totalRevenue", "costOfRevenue", "netIncome"],
+    "balance_sheets": ["symbol", "report_type", "fiscal_date", "totalAssets", "totalShareholderEquity",
+                       "commonStockSharesOutstanding"],
+    "company_overviews": ["symbol", "Name"],
+}
+
+# Relative tolerance for halves in sql_round(), about the precision of 15 significant digits
+ROUND_EPSILON = 1e-15
+
+
+def load_frames():
+    """Read the datasets the analyses need, with prices sorted by (symbol, date).
+
+    Frames use the compact dtype profile (compact_dtypes.py): categorical
+    symbols everywhere, and int32 day numbers and float32 prices in the price
+    panel. Fundamentals keep their ISO date strings, which the results report.
+    """
+    frames = {}
+    for name, columns in FRAME_COLUMNS.items():
+        df = storage.read_dataset(name, columns=columns, dtype=CATEGORY_DTYPES)
+        if df is None:
+            raise FileNotFoundError(f"Dataset '{name}' not found in {storage.DATA_DIR}")
+        frames[name] = compact_frame(df, dates=name == "stock_prices")
+    frames["stock_prices"] = frames["stock_prices"].sort_values(["symbol", "date"], ignore_index=True)
+    return frames
+
+
+def month_start(months_back, today=None):
+    """ISO date of DATE('now', 'start of month', '-N months') in SQLite (UTC)."""
+    today = today or datetime.now(timezone.utc).date()
+    month_index = today.year * 12 + today.month - 1 - months_back
+    return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}-01"
+
+
+def sql_round(values, digits):
+    """ROUND() as SQLite does it: halves are rounded away from zero.
+
+    SQLite rounds the value's decimal digits, so e.g. 40.925 (stored as
+    40.92499999...) rounds up; the relative nudge reproduces that.
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10.0 ** digits
+    scaled = np.abs(values) * scale
+    return np.sign(values) * np.floor(scaled + 0.5 + scaled * ROUND_EPSILON) / scale
+
+
+def safe_divide(numerator, denominator):
+    """Division that yields NaN (SQL NULL) instead of inf for a zero denominator."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator == 0, np.nan, numerator / denominator)
+
+
+def with_company_name(df, frames, name_column="company_name"):
+    """Inner join on company_overviews, as every query does, adding the company name.
+
+    Results carry symbols as plain strings rather than categories.
+    """
+    names = frames["company_overviews"].rename(columns={"Name": name_column})
+    df = df.merge(names, on="symbol", how="inner")
+    return df.assign(symbol=df["symbol"].astype(object))
+
+
+def annual_fundamentals(frames):
+    """Annual income statements joined to annual balance sheets on (symbol, fiscal_date)."""
+    income = frames["income_statements"]
+    balance = frames["balance_sheets"]
+    income = income[income["report_type"] == "annual"].drop(columns="report_type")
+    balance = balance[balance["report_type"] == "annual"].drop(columns="report_type")
+    return income.merge(balance, on=["symbol", "fiscal_date"], how="inner")
+
+
+#==================================================
+#              EVENT OFFSETS (NUMPY)
+#==================================================
+
+def price_keys(prices):
+    """Sortable int64 key per price row: symbol code in the high bits, day number in the low bits.
+
+    Returns (keys, symbols) where `symbols` lists the symbol of each code.
+    `prices` must be sorted by (symbol, date).
+    """
+    symbols = pd.Index(np.asarray(prices["symbol"].unique(), dtype=object))
+    codes = symbols.get_indexer(np.asarray(prices["symbol"], dtype=object)).astype(np.int64)
+    days = day_numbers(prices["date"]).astype(np.int64)
+    return (codes << 32) | (days + 2**31), symbols
+
+
+def event_prices(prices, event_symbols, event_dates, offsets):
+    """Closing prices `offset` trading days after each event, for every offset.
+
+    An event is found by binary search on its (symbol, date) key; the row
+    `offset` positions later is its price if it still belongs to the same
+    symbol. Returns (found, closes): a mask of events whose date is a trading
+    day and an array of shape (events, offsets) with NaN past a symbol's last
+    price. Works on plain arrays, so scenario sweeps over many offsets never
+    build intermediate DataFrames.
+    """
+    keys, symbols = price_keys(prices)
+    codes = symbols.get_indexer(np.asarray(event_symbols, dtype=object)).astype(np.int64)
+    days = day_numbers(event_dates).astype(np.int64)
+    event_keys = (codes << 32) | (days + 2**31)
+
+    position = np.searchsorted(keys, event_keys)
+    found = (codes >= 0) & (position < len(keys))
+    found[found] = keys[position[found]] == event_keys[found]
+
+    # End of each symbol's block of rows, so offsets cannot run into the next symbol
+    code_of_row = keys >> 32
+    block_end = np.searchsorted(code_of_row, codes, side="right")
+
+    close = as_float64(prices["close"])
+    closes = np.full((len(event_keys), len(offsets)), np.nan)
+    for column, offset in enumerate(offsets):
+        target = position + offset
+        valid = found & (target < block_end)
+        closes[valid, column] = close[target[valid]]
+    return found, closes
+
+
+def earnings_event_prices(frames, offsets):
+    """Recent quarterly earnings events with the closing price at each trading-day offset."""
+    earnings = frames["quarterly_earnings"]
+    earnings = earnings[earnings["fiscal_quarter"] > month_start(60)]
+    found, closes = event_prices(frames["stock_prices"], earnings["symbol"], earnings["reported_date"], offsets)
+    events = earnings[found].reset_index(drop=True)
+    return events, closes[found]
+
+
+#==================================================
+#                    ANALYSES
+#==================================================
+
+def earnings_surprise_vs_price_reaction(frames):
+    events, closes = earnings_event_prices(frames, [0, 5])
+    df = events[["symbol", "fiscal_quarter", "reported_date"]].assign(
+        surprise_pct=sql_round(events["surprise_pct"], 2),
+        day_0_price=closes[:, 0],
+        day_5_price=closes[:, 1],
+        price_change_5d_pct=sql_round(100 * safe_divide(closes[:, 1] - closes[:, 0], closes[:, 0]), 2),
+    )
+    df = df[~np.isnan(closes).any(axis=1)]
+    df = with_company_name(df, frames, name_column="name")
+    return df[["symbol", "name", "fiscal_quarter", "reported_date", "surprise_pct",
+               "day_0_price", "day_5_price", "price_change_5d_pct"]]
+
+
+def monthly_net_2pct_gain_counts(frames):
+    prices = frames["stock_prices"]
+    prices = prices[day_numbers(prices["date"]) >= day_numbers(month_start(35))]
+    daily_return = (as_float64(prices["close"]) - as_float64(prices["open"])) / as_float64(prices["open"])
+    df = pd.DataFrame({
+        "symbol": prices["symbol"],
+        "month": iso_months(day_numbers(prices["date"])),
+        "gain": daily_return > 0.02,
+        "loss": daily_return < -0.02,
+        "daily_return_pct": daily_return,
+    })
+    df = df.groupby(["symbol", "month"], as_index=False, observed=True).agg(
+        nr_2pct_gains=("gain", "sum"),
+        nr_2pct_losses=("loss", "sum"),
+        avg_return=("daily_return_pct", "mean"),
+        days_in_month=("daily_return_pct", "size"),
+    )
+    df["nr_net_gains"] = df["nr_2pct_gains"] - df["nr_2pct_losses"]
+    df = with_company_name(df, frames)
+    return df[["symbol", "month", "nr_2pct_gains", "nr_2pct_losses", "nr_net_gains", "avg_return",
+               "days_in_month", "company_name"]]
+
+
+def post_earnings_drift(frames):
+    events, closes = earnings_event_prices(frames, [6, 20])
+    surprise = events["surprise_pct"].to_numpy(dtype=float)
+    df = events[["symbol", "fiscal_quarter", "reported_date"]].assign(
+        surprise_pct=sql_round(surprise, 2),
+        is_positive_surprise=np.where(np.isnan(surprise), np.nan, surprise > 0),
+        day_6_price=closes[:, 0],
+        day_20_price=closes[:, 1],
+        post_earnings_drift_pct=sql_round(100 * safe_divide(closes[:, 1] - closes[:, 0], closes[:, 0]), 2),
+    )
+    df = df[~np.isnan(closes).any(axis=1)]
+    df = with_company_name(df, frames, name_column="name")
+    return df[["symbol", "name", "fiscal_quarter", "reported_date", "surprise_pct", "is_positive_surprise",
+               "day_6_price", "day_20_price", "post_earnings_drift_pct"]]
+
+
+def profitability_ratios_annual(frames):
+    f = annual_fundamentals(frames)
+    df = f[["symbol", "fiscal_date"]].assign(
+        gross_margin=sql_round(100 * safe_divide(f["totalRevenue"] - f["costOfRevenue"], f["totalRevenue"]), 1),
+        net_margin=sql_round(100 * safe_divide(f["netIncome"], f["totalRevenue"]), 1),
+        return_on_assets=sql_round(100 * safe_divide(f["netIncome"], f["totalAssets"]), 1),
+        return_on_equity=sql_round(100 * safe_divide(f["netIncome"], f["totalShareholderEquity"]), 1),
+    )
+    df = with_company_name(df, frames)
+    return df[["symbol", "company_name", "fiscal_date", "gross_margin", "net_margin",
+               "return_on_assets", "return_on_equity"]]
+
+
+def stock_volatility_last_6_months(frames):
+    prices = frames["stock_prices"]
+    days = day_numbers(prices["date"])
+    prices = prices[(days >= day_numbers(month_start(6))) & (days < day_numbers(month_start(0)))]
+    open_ = as_float64(prices["open"])
+    df = pd.DataFrame({
+        "symbol": prices["symbol"],
+        "month": iso_months(day_numbers(prices["date"])),
+        "daily_return": 100 * (as_float64(prices["close"]) - open_) / open_,
+    })
+    df = df.groupby(["symbol", "month"], as_index=False, observed=True).agg(
+        avg_daily_return=("daily_return", "mean"),
+        trading_days=("daily_return", "size"),
+    )
+    df["avg_daily_return"] = sql_round(df["avg_daily_return"], 2)
+    df = with_company_name(df, frames).sort_values(["symbol", "month"], ignore_index=True)
+    return df[["symbol", "company_name", "month", "avg_daily_return", "trading_days"]]
+
+
+def valuation_multiples(frames):
+    f = annual_fundamentals(frames)
+    prices = frames["stock_prices"][["symbol", "date", "close"]]
+
+    # As-of join: first price strictly after each fiscal year end
+    f = f.assign(symbol=np.asarray(f["symbol"], dtype=object), fiscal_day=day_numbers(f["fiscal_date"]))
+    prices = prices.assign(symbol=np.asarray(prices["symbol"], dtype=object),
+                           price_day=day_numbers(prices["date"]))
+    df = pd.merge_asof(f.sort_values("fiscal_day"), prices.sort_values("price_day"), left_on="fiscal_day",
+                       right_on="price_day", by="symbol", direction="forward", allow_exact_matches=False)
+    df = df[df["price_day"].notna()]
+
+    shares = df["commonStockSharesOutstanding"]
+    close = as_float64(df["close"])
+    df = df[["symbol"]].assign(
+        price_date=iso_dates(day_numbers(df["price_day"])),
+        PE=sql_round(safe_divide(close, safe_divide(df["netIncome"], shares)), 2),
+        PS=sql_round(safe_divide(close, safe_divide(df["totalRevenue"], shares)), 2),
+        PB=sql_round(safe_divide(close, safe_divide(df["totalShareholderEquity"], shares)), 2),
+    )
+    df = with_company_name(df, frames)
+    return df[["symbol", "company_name", "price_date", "PE", "PS", "PB"]]
+
+
+# Analysis per query file in queries/
+ANALYSES = {
+    "earnings_surprise_vs_price_reaction.sql": earnings_surprise_vs_price_reaction,
+    "monthly_net_2pct_gain_counts.sql": monthly_net_2pct_gain_counts,
+    "post_earnings_drift.sql": post_earnings_drift,
+    "profitability_ratios_annual.sql": profitability_ratios_annual,
+    "stock_volatility_last_6_months.sql": stock_volatility_last_6_months,
+    "valuation_multiples.sql": valuation_multiples,
+}
@@ -0,0 +1,461 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from instrumentation import count
+from requests.adapters import HTTPAdapter
+from response_cache import CacheMissError, ResponseCache
+from contextlib import contextmanager
+import argparse
+import hashlib
+import random
+import requests
+import threading
+import time
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+#==================================================
+#            ALPHA VANTAGE FETCH CLIENT
+#==================================================
+
+# Shared request path for all fetch_* scripts: one keep-alive session, one
+# rate limiter and a thread pool, so several endpoint families can be fetched
+# at once while the API quota remains the only limit on throughput. Every
+# reply is classified as data, throttled, invalid symbol or transport error;
+# throttled and transport errors are retried with jittered exponential backoff,
+# and every request is counted in a daily quota ledger kept on disk.
+
+BASE_URL = "https://www.alphavantage.co/query"
+
+# Free tier limits
+REQUESTS_PER_MINUTE = 5
+REQUESTS_PER_DAY = 500
+
+# Environment overrides, e.g. to point the fetchers at scripts/mock_alpha_vantage.py.
+# A limit of 0 disables it.
+BASE_URL_ENV = "ALPHA_VANTAGE_BASE_URL"
+REQUESTS_PER_MINUTE_ENV = "ALPHA_VANTAGE_REQUESTS_PER_MINUTE"
+REQUESTS_PER_DAY_ENV = "ALPHA_VANTAGE_REQUESTS_PER_DAY"
+WORKERS_ENV = "ALPHA_VANTAGE_WORKERS"
+API_KEYS_ENV = "ALPHA_VANTAGE_API_KEYS"
+MAX_RETRIES_ENV = "ALPHA_VANTAGE_MAX_RETRIES"
+BACKOFF_SECONDS_ENV = "ALPHA_VANTAGE_BACKOFF_SECONDS"
+
+# Retries of a throttled or failed request, waiting about 5, 10, 20 and 40s
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 5.0
+BACKOFF_CAP = 60.0
+
+# Reply classes (see classify_response())
+DATA = "data"
+THROTTLED = "throttled"
+INVALID_SYMBOL = "invalid_symbol"
+TRANSPORT_ERROR = "transport_error"
+
+
+def load_api_keys(base_dir: Path):
+    """Return every Alpha Vantage API key from `.env`/environment, possibly none.
+
+    Keys come from ALPHA_VANTAGE_API_KEYS (comma-separated) and
+    ALPHA_VANTAGE_API_KEY, in that order.
+    """
+    load_dotenv(base_dir / ".env")
+    candidates = (os.getenv(API_KEYS_ENV) or "").split(",") + [os.getenv("ALPHA_VANTAGE_API_KEY") or ""]
+    keys = [key.strip() for key in candidates]
+    return [key for key in dict.fromkeys(keys) if key and key != "your_actual_api_key_here"]
+
+
+def load_api_key(base_dir: Path):
+    """Return the first Alpha Vantage API key from `.env`/environment, or None."""
+    keys = load_api_keys(base_dir)
+    return keys[0] if keys else None
+
+
+class QuotaExceededError(RuntimeError):
+    """Raised when the daily request budget has been used up."""
+
+
+class ThrottledError(RuntimeError):
+    """Raised when a request is still throttled after every retry."""
+
+
+class InvalidSymbolError(ValueError):
+    """Raised when Alpha Vantage rejects a request, e.g. for an unknown symbol. Never retried."""
+
+
+# Phrases of the "Information" replies about rate limits. Other "Information"
+# replies, e.g. for premium endpoints, reject the request for good.
+RATE_LIMIT_PHRASES = ["rate limit", "call frequency", "per minute", "per day"]
+
+
+def is_rate_limit(message):
+    message = message.lower()
+    return any(phrase in message for phrase in RATE_LIMIT_PHRASES)
+
+
+def classify_response(data):
+    """Classify a decoded reply as DATA, THROTTLED or INVALID_SYMBOL.
+
+    Throttling replies carry a "Note", or an "Information" message about the
+    rate limits. Rejected requests carry an "Error Message" or any other
+    "Information" (such as a premium endpoint notice); OVERVIEW answers an
+    unknown symbol with {}.
+    """
+    if not isinstance(data, dict) or "Error Message" in data or not data:
+        return INVALID_SYMBOL
+    if "Note" in data:
+        return THROTTLED
+    if "Information" in data:
+        return THROTTLED if is_rate_limit(str(data["Information"])) else INVALID_SYMBOL
+    return DATA
+
+
+def reply_message(data):
+    if not isinstance(data, dict):
+        return repr(data)
+    return data.get("Note") or data.get("Information") or data.get("Error Message") or "empty reply"
+
+
+def is_daily_limit(message):
+    """True for the throttling message of an exhausted daily limit, which no retry today can fix."""
+    message = message.lower()
+    return "per day" in message and "per minute" not in message
+
+
+def is_retryable(error):
+    """Connection problems, timeouts, HTTP 429 and 5xx are worth retrying; other HTTP errors are not."""
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.exceptions.HTTPError) and response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return True
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (created if needed) across processes."""
+    with open(path, "a") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class QuotaLedger:
+    """Append-only log of the requests made with one API key, one file per day.
+
+    Every process using the key counts and appends to the same file under a
+    file lock, so the day's count survives restarts and one limit holds for
+    concurrent runs. The key itself is only stored as a hash.
+    """
+
+    def __init__(self, ledger_dir, api_key):
+        key_id = hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:12]
+        self.ledger_dir = Path(ledger_dir) / key_id
+        self.lock = threading.Lock()
+
+    def path(self, day):
+        return self.ledger_dir / f"{day.isoformat()}.log"
+
+    def used(self, day):
+        """Requests recorded on `day`."""
+        try:
+            with open(self.path(day), "r") as file:
+                return sum(1 for _ in file)
+        except FileNotFoundError:
+            return 0
+
+    def reserve(self, day, limit):
+        """Record a request on `day` unless `limit` requests are recorded already. Returns whether it was."""
+        with self.lock:
+            self.ledger_dir.mkdir(parents=True, exist_ok=True)
+            with file_lock(self.ledger_dir / ".lock"):
+                if self.used(day) >= limit:
+                    return False
+                with open(self.path(day), "a") as file:
+                    file.write(f"{datetime.now().isoformat(timespec='seconds')}\n")
+                return True
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per `per` seconds.
+
+    The capacity defaults to 1 so requests are spaced evenly (one every 12s
+    at 5/min). A larger burst would let more than `rate` requests through in
+    a sliding one-minute window, which Alpha Vantage rejects.
+    """
+
+    def __init__(self, rate, per=60.0, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = capacity
+        self.fill_rate = rate / per
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            self.sleep(wait)
+
+
+class DailyQuota:
+    """Counts requests per calendar day and refuses to exceed `limit`.
+
+    With a `ledger`, every request is checked against and recorded in the
+    ledger, so the limit covers all processes using the same key.
+    """
+
+    def __init__(self, limit, today=date.today, ledger=None):
+        self.limit = limit
+        self.today = today
+        self.ledger = ledger
+        self.day = today()
+        self.used = 0
+        self.exhausted_day = None
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.today() != self.day:
+                self.day = self.today()
+                self.used = 0
+            if self.exhausted_day == self.day:
+                raise QuotaExceededError(f"Daily limit of {self.limit:g} requests reached")
+            if self.ledger is not None:
+                if not self.ledger.reserve(self.day, self.limit):
+                    raise QuotaExceededError(f"Daily limit of {self.limit:g} requests reached")
+            elif self.used >= self.limit:
+                raise QuotaExceededError(f"Daily limit of {self.limit:g} requests reached")
+            self.used += 1
+
+    def exhaust(self):
+        """Refuse further requests today, e.g. after the API reported its daily limit."""
+        with self.lock:
+            self.exhausted_day = self.today()
+
+    @property
+    def remaining(self):
+        if self.exhausted_day == self.today():
+            return 0
+        used = self.ledger.used(self.today()) if self.ledger is not None else self.used
+        return max(self.limit - used, 0)
+
+
+class RateLimiter:
+    """Per-minute token bucket combined with a daily request budget.
+
+    Pass None for either limit to disable it (e.g. against a local stub server).
+    """
+
+    def __init__(self, per_minute=REQUESTS_PER_MINUTE, per_day=REQUESTS_PER_DAY, ledger=None):
+        self.bucket = TokenBucket(per_minute) if per_minute else None
+        self.quota = DailyQuota(per_day, ledger=ledger) if per_day else None
+
+    def acquire(self):
+        # Check the daily budget first so an exhausted quota fails fast
+        if self.quota is not None:
+            self.quota.acquire()
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def exhaust(self):
+        if self.quota is not None:
+            self.quota.exhaust()
+
+
+class AlphaVantageClient:
+    """Concurrent, rate-limited client for the Alpha Vantage query endpoint."""
+
+    def __init__(self, api_key, base_url=BASE_URL, limiter=None, max_workers=REQUESTS_PER_MINUTE, timeout=10,
+                 cache=None, replay=False, max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, backoff_cap=BACKOFF_CAP,
+                 sleep=time.sleep, jitter=random.random):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.replay = replay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.sleep = sleep
+        self.jitter = jitter
+
+        # Reuse keep-alive connections across all requests and worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, function, symbol, **params):
+        """Fetch one endpoint for one symbol and return the decoded JSON.
+
+        Fresh cached responses are served without touching the network or the
+        rate limiter. In replay mode only the cache is used, regardless of age.
+        """
+        if self.cache is not None:
+            data = self.cache.get(function, symbol, params, ignore_ttl=self.replay)
+            if data is not None:
+                count("api_cache_hits")
+                return data
+        if self.replay:
+            raise CacheMissError(f"No cached {function} response for {symbol}")
+
+        for attempt in range(self.max_retries + 1):
+            status, result = self.request(function, symbol, params)
+            if status == DATA:
+                if self.cache is not None:
+                    self.cache.put(function, symbol, params, result)
+                return result
+            count(f"api_{status}")
+            if status == INVALID_SYMBOL:
+                raise InvalidSymbolError(f"{function} rejected for {symbol}: {reply_message(result)}")
+            if status == THROTTLED:
+                if is_daily_limit(reply_message(result)):
+                    self.limiter.exhaust()
+                    raise QuotaExceededError(reply_message(result))
+                error = ThrottledError(f"Throttled after {attempt + 1} attempts: {reply_message(result)}")
+            else:
+                error = result
+                if not is_retryable(error):
+                    raise error
+            if attempt < self.max_retries:
+                count("api_retries")
+                self.sleep(self.backoff_delay(attempt))
+        raise error
+
+    def request(self, function, symbol, params):
+        """Make one request, counted against the rate limits. Returns (reply class, data or exception)."""
+        self.limiter.acquire()
+        count("api_calls")
+        query = {"function": function, "symbol": symbol, **params, "apikey": self.api_key}
+        try:
+            response = self.session.get(self.base_url, params=query, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return TRANSPORT_ERROR, e
+        return classify_response(data), data
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with jitter: a random wait between half and all of backoff * 2**attempt."""
+        delay = min(self.backoff_cap, self.backoff * 2 ** attempt)
+        return delay / 2 * (1 + self.jitter())
+
+    def fetch_many(self, jobs, on_result=None):
+        """Fetch `(function, symbol, params)` jobs concurrently.
+
+        Returns a list of `(job, data, error)` tuples in the order of `jobs`,
+        where exactly one of `data` and `error` is None. `on_result(job, data)`
+        is called for each response as soon as it arrives, e.g. to checkpoint it;
+        an exception it raises becomes that job's error.
+        """
+        def run(job):
+            function, symbol, params = job
+            try:
+                data = self.get(function, symbol, **params)
+            except (requests.exceptions.RequestException, ValueError, QuotaExceededError, ThrottledError,
+                    CacheMissError) as e:
+                return job, None, e
+            if on_result is not None:
+                try:
+                    on_result(job, data)
+                except Exception as e:
+                    return job, None, e
+            return job, data, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(run, jobs))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fetch_argument_parser(description):
+    """Command line options shared by the fetch scripts."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--replay", action="store_true",
+                        help="rebuild the CSVs purely from cached API responses, without network calls")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignore cached responses and always call the API")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="discard the checkpoints of an unfinished run instead of resuming it")
+    return parser
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def shared_limit(limit, sharing):
+    """Each sharer's part of a rate limit (0 stays disabled)."""
+    return limit / sharing if limit else limit
+
+
+def build_client(base_dir: Path, replay=False, use_cache=True, shard=0, shards=1):
+    """Create a client for the fetch scripts, or None if there is no API key to fetch with.
+
+    The endpoint, rate limits, worker count and retries can be overridden
+    with the ALPHA_VANTAGE_BASE_URL, ALPHA_VANTAGE_REQUESTS_PER_MINUTE,
+    ALPHA_VANTAGE_REQUESTS_PER_DAY, ALPHA_VANTAGE_WORKERS,
+    ALPHA_VANTAGE_MAX_RETRIES and ALPHA_VANTAGE_BACKOFF_SECONDS variables.
+    Requests are counted per key in cache/quota/.
+
+    When the universe is fetched in `shards` worker processes, shard number
+    `shard` uses API key number `shard` (cycling through the keys) and the
+    shards that share a key split its per-minute limit. They draw on the
+    key's daily limit through its shared ledger.
+    """
+    cache = ResponseCache() if use_cache or replay else None
+    if replay:
+        return AlphaVantageClient(None, cache=cache, replay=True)
+
+    api_keys = load_api_keys(base_dir)
+    if not api_keys:
+        return None
+    api_key = api_keys[shard % len(api_keys)]
+    sharing = len(range(shard % len(api_keys), shards, len(api_keys)))
+    limiter = RateLimiter(shared_limit(env_int(REQUESTS_PER_MINUTE_ENV, REQUESTS_PER_MINUTE), sharing),
+                          env_int(REQUESTS_PER_DAY_ENV, REQUESTS_PER_DAY),
+                          ledger=QuotaLedger(base_dir / "cache" / "quota", api_key))
+    return AlphaVantageClient(api_key, base_url=os.getenv(BASE_URL_ENV) or BASE_URL, limiter=limiter,
+                              max_workers=env_int(WORKERS_ENV, REQUESTS_PER_MINUTE), cache=cache,
+                              max_retries=env_int(MAX_RETRIES_ENV, MAX_RETRIES),
+                              backoff=env_float(BACKOFF_SECONDS_ENV, BACKOFF_SECONDS))
@@ -0,0 +1,188 @@
+from pathlib import Path
+from datetime import date
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+#==================================================
+#          BENCHMARK THE FULL PIPELINE
+#==================================================
+
+# Runs every pipeline stage on deterministic synthetic data in a throwaway
+# copy of the project, so data/, database/ and results/ are never touched.
+# Each stage is a separate process, timed with its own resource usage:
+# wall time, CPU time and peak resident memory. Results can be saved as a
+# baseline and later runs compared against it to catch regressions.
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+SCRIPTS_DIR = BASE_DIR / "scripts"
+QUERIES_DIR = BASE_DIR / "queries"
+BASELINE_PATH = BASE_DIR / "benchmarks" / "pipeline_baseline.json"
+
+# Differences below this many seconds are treated as timing noise
+MIN_WALL_DIFF_S = 0.05
+
+VISUALIZE_SCRIPTS = sorted(path.name for path in SCRIPTS_DIR.glob("visualize_*.py"))
+
+
+def pipeline_stages(symbols, years, quarters, seed, end_date):
+    """(stage name, script arguments) in pipeline order."""
+    generate = ["generate_synthetic_data.py", "--symbols", str(symbols), "--years", str(years),
+                "--quarters", str(quarters), "--seed", str(seed)]
+    if end_date:
+        generate += ["--end-date", end_date]
+    stages = [
+        ("generate", generate),
+        ("load_to_db", ["load_to_db.py"]),
+        ("run_queries", ["run_queries.py", "--no-cache"]),
+    ]
+    stages += [(script.replace(".py", ""), [script]) for script in VISUALIZE_SCRIPTS]
+    return stages
+
+
+def make_project_copy(tmp_dir):
+    """Copy scripts/ and queries/ into an empty project tree under `tmp_dir`."""
+    project = Path(tmp_dir)
+    ignore = shutil.ignore_patterns("__pycache__")
+    shutil.copytree(SCRIPTS_DIR, project / "scripts", ignore=ignore)
+    shutil.copytree(QUERIES_DIR, project / "queries", ignore=ignore)
+    for folder in ["data", "database", "results", "figures"]:
+        (project / folder).mkdir()
+    return project
+
+
+def peak_memory_mb(rusage):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return rusage.ru_maxrss / scale
+
+
+def run_stage(project, args):
+    """Run one script of the project copy and return its wall time, CPU time and peak memory."""
+    env = {**os.environ, "MPLBACKEND": "Agg"}  # Render figures without opening windows
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(project / "scripts" / args[0]), *args[1:]],
+                               cwd=project, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    if hasattr(os, "wait4"):
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)  # Already reaped by wait4
+    else:
+        # Windows has no wait4, so only wall time is measured there
+        process.wait()
+        rusage = None
+    wall_s = time.perf_counter() - start
+
+    if process.returncode != 0:
+        raise RuntimeError(f"{args[0]} exited with code {process.returncode}:\n{stderr.decode(errors='replace')}")
+    return {
+        "wall_s": round(wall_s, 3),
+        "cpu_s": round(rusage.ru_utime + rusage.ru_stime, 3) if rusage else None,
+        "peak_mb": round(peak_memory_mb(rusage), 1) if rusage else None,
+    }
+
+
+def run_benchmark(symbols, years, quarters, seed=0, end_date=None):
+    """Run all stages on fresh synthetic data and return {"params", "stages"}.
+
+    The data ends at `end_date` (default today); the date used is recorded in
+    the params, so a baseline can be rerun on exactly the same data.
+    """
+    end_date = end_date or date.today().isoformat()
+    params = {"symbols": symbols, "years": years, "quarters": quarters, "seed": seed, "end_date": end_date}
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        project = make_project_copy(tmp_dir)
+        for name, args in pipeline_stages(symbols, years, quarters, seed, end_date):
+            print(f"Running {name}...", flush=True)
+            stages[name] = run_stage(project, args)
+    return {"params": params, "stages": stages}
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Add the baseline and change per stage; returns (table, regressed stage names)."""
+    if baseline["params"] != report["params"]:
+        print(f"Warning: baseline was recorded with {baseline['params']}, this run used {report['params']}")
+
+    rows, regressions = [], []
+    for name, current in report["stages"].items():
+        row = {"stage": name, **current}
+        previous = baseline["stages"].get(name)
+        if previous is not None:
+            row["base_wall_s"] = previous["wall_s"]
+            row["base_peak_mb"] = previous["peak_mb"]
+            slower = (current["wall_s"] > previous["wall_s"] * (1 + tolerance)
+                      and current["wall_s"] - previous["wall_s"] > MIN_WALL_DIFF_S)
+            larger = (current["peak_mb"] is not None and previous["peak_mb"] is not None
+                      and current["peak_mb"] > previous["peak_mb"] * (1 + tolerance))
+            row["status"] = "REGRESSION" if slower or larger else "ok"
+            if slower or larger:
+                regressions.append(name)
+        else:
+            row["status"] = "new"
+        rows.append(row)
+    return pd.DataFrame(rows), regressions
+
+
+def main(symbols=20, years=10, quarters=40, seed=0, end_date=None, baseline_path=BASELINE_PATH,
+         save_baseline=False, tolerance=0.25):
+    baseline_path = Path(baseline_path)
+    baseline = None
+    if baseline_path.exists() and not save_baseline:
+        with open(baseline_path, "r") as file:
+            baseline = json.load(file)
+        # Generate the same data as the baseline unless another end date is asked for
+        end_date = end_date or baseline["params"].get("end_date")
+
+    report = run_benchmark(symbols, years, quarters, seed, end_date)
+
+    if baseline is not None:
+        table, regressions = compare_to_baseline(report, baseline, tolerance)
+    else:
+        table = pd.DataFrame([{"stage": name, **values} for name, values in report["stages"].items()])
+        regressions = []
+
+    print()
+    print(table.to_string(index=False))
+    print(f"\nTotal wall time: {table['wall_s'].sum():.2f}s, "
+          f"max peak memory: {pd.to_numeric(table['peak_mb']).max():.1f} MB")
+
+    if save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+    elif regressions:
+        print(f"Regressions (>{tolerance:.0%} slower or larger): {', '.join(regressions)}")
+    return report, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each pipeline stage on synthetic data and compare to a baseline.")
+    parser.add_argument("--symbols", type=int, default=20, help="number of synthetic ticker symbols")
+    parser.add_argument("--years", type=float, default=10, help="years of daily price history")
+    parser.add_argument("--quarters", type=int, default=40, help="quarters of earnings and statements")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the generator")
+    parser.add_argument("--end-date", default=None, help="last synthetic price date, YYYY-MM-DD (default: the baseline's, else today)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="baseline JSON to compare against or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative increase in wall time or peak memory (default 0.25)")
+    args = parser.parse_args()
+    _, regressions = main(args.symbols, args.years, args.quarters, args.seed, args.end_date,
+                          args.baseline, args.save_baseline, args.tolerance)
+    raise SystemExit(1 if regressions else 0)
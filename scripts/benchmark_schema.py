@@ -0,0 +1,97 @@
+from pathlib import Path
+from schema import create_schema, refresh_trading_days
+import argparse
+import sqlite3
+import tempfile
+import time
+import pandas as pd
+
+#==================================================
+#        BENCHMARK QUERIES: LEGACY VS TYPED SCHEMA
+#==================================================
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+# Set paths
+DATA_DIR = BASE_DIR / "data"
+QUERIES_DIR = BASE_DIR / "queries"
+
+csv_table_pairs = [
+    ("stock_prices.csv", "stock_prices"),
+    ("annual_earnings.csv", "annual_earnings"),
+    ("quarterly_earnings.csv", "quarterly_earnings"),
+    ("income_statements.csv", "income_statements"),
+    ("balance_sheets.csv", "balance_sheets"),
+    ("company_overviews.csv", "company_overviews")
+]
+
+
+def build_database(db_path, typed):
+    """Load data/ into `db_path`, either untyped via to_sql (legacy) or into schema.py tables.
+
+    Both get the trading_day column the queries rely on; only the typed
+    database has keys and indexes.
+    """
+    with sqlite3.connect(db_path) as conn:
+        if typed:
+            create_schema(conn)
+        for filename, table_name in csv_table_pairs:
+            df = pd.read_csv(DATA_DIR / filename)
+            df.to_sql(table_name, conn, if_exists="append" if typed else "replace", index=False)
+        if not typed:
+            conn.execute("ALTER TABLE stock_prices ADD COLUMN trading_day INTEGER")
+        refresh_trading_days(conn, all_symbols=True)
+        if typed:
+            conn.execute("ANALYZE")
+
+
+def time_query(db_path, sql, repeat):
+    """Best-of-`repeat` wall time in milliseconds, fetching all rows."""
+    timings = []
+    with sqlite3.connect(db_path) as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql).fetchall()
+            timings.append(1000 * (time.perf_counter() - start))
+    return min(timings)
+
+
+def main(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_db = Path(tmp_dir) / "legacy.db"
+        typed_db = Path(tmp_dir) / "typed.db"
+        build_database(legacy_db, typed=False)
+        build_database(typed_db, typed=True)
+
+        rows = []
+        for query_path in sorted(QUERIES_DIR.glob("*.sql")):
+            sql = query_path.read_text()
+            legacy_ms = time_query(legacy_db, sql, repeat)
+            typed_ms = time_query(typed_db, sql, repeat)
+            rows.append({
+                "query": query_path.stem,
+                "legacy_ms": round(legacy_ms, 2),
+                "typed_ms": round(typed_ms, 2),
+                "speedup": round(legacy_ms / typed_ms, 2) if typed_ms else float("nan"),
+            })
+
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    total_legacy = report["legacy_ms"].sum()
+    total_typed = report["typed_ms"].sum()
+    print(f"\nTotal: {total_legacy:.1f} ms -> {total_typed:.1f} ms ({total_legacy / total_typed:.2f}x)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare query runtimes on the legacy untyped tables and the typed schema.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query; the fastest is reported")
+    args = parser.parse_args()
+    main(repeat=args.repeat)
@@ -0,0 +1,138 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+#==================================================
+#             COMPACT DTYPE PROFILE
+#==================================================
+
+# Smaller in-memory dtypes for the price and fundamentals frames:
+# categorical symbols and report types, int32 day numbers instead of ISO date
+# strings, float32 prices where every value survives the round trip, and
+# integer volume. Stored files keep their usual layout; each path chooses the
+# conversions it can use (the database load keeps dates and float64 prices,
+# since SQLite would store the float32 values as they are).
+
+CATEGORY_COLUMNS = ["symbol", "report_type"]
+DATE_COLUMNS = ["date", "fiscal_date", "fiscal_quarter", "reported_date"]
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+INTEGER_COLUMNS = ["volume"]
+
+# dtype argument for storage.read_path(), so strings are categorized while parsing
+CATEGORY_DTYPES = {column: "category" for column in CATEGORY_COLUMNS}
+
+# Alpha Vantage quotes prices with at most 4 decimals
+PRICE_DECIMALS = 4
+
+
+def day_numbers(dates):
+    """Days since 1970-01-01 as int32, from ISO date strings, datetimes or day numbers.
+
+    Accepts a single date as well, e.g. day_numbers("2025-01-31").
+    """
+    values = np.asarray(dates)
+    if values.dtype.kind in "iuf":
+        return values.astype(np.int32)
+    return values.astype("datetime64[D]").astype(np.int32)
+
+
+def iso_dates(days):
+    """ISO date strings (YYYY-MM-DD) of int32 day numbers."""
+    return np.asarray(days).astype("datetime64[D]").astype(str).astype(object)
+
+
+def iso_months(days):
+    """Month strings (YYYY-MM) of int32 day numbers."""
+    return np.asarray(days).astype("datetime64[D]").astype("datetime64[M]").astype(str).astype(object)
+
+
+def float32_if_exact(values, decimals=PRICE_DECIMALS):
+    """`values` as float32 if rounding back to `decimals` restores every value, else unchanged."""
+    compact = values.astype(np.float32)
+    restored = np.round(compact.astype(np.float64), decimals)
+    if np.array_equal(restored, values, equal_nan=True):
+        return compact
+    return values
+
+
+def as_float64(series, decimals=PRICE_DECIMALS):
+    """Exact float64 values of a price column, undoing float32_if_exact()."""
+    values = series.to_numpy(dtype=np.float64)
+    if series.dtype == np.float32:
+        values = np.round(values, decimals)
+    return values
+
+
+def smallest_integer(values):
+    """Whole-number floats as uint32 or int64, or unchanged if any value is fractional or missing."""
+    if not np.isfinite(values).all() or not (values == np.floor(values)).all():
+        return values
+    if len(values) and values.min() >= 0 and values.max() < 2**32:
+        return values.astype(np.uint32)
+    return values.astype(np.int64)
+
+
+def compact_frame(df, dates=True, prices=True):
+    """Return `df` with the compact dtype profile applied to the columns it has.
+
+    Categorical strings and integer volume are always applied. `dates`
+    replaces date strings with int32 day numbers and `prices` stores prices as
+    float32 where that is exact.
+    """
+    df = df.copy()
+    for column in CATEGORY_COLUMNS:
+        # Categories only pay off when values repeat
+        if column in df.columns and df[column].nunique() <= len(df) // 2:
+            df[column] = df[column].astype(pd.CategoricalDtype(sorted(df[column].dropna().unique())))
+    for column in INTEGER_COLUMNS:
+        if column in df.columns and df[column].dtype.kind == "f":
+            df[column] = smallest_integer(df[column].to_numpy())
+    if dates:
+        for column in DATE_COLUMNS:
+            if column in df.columns and df[column].notna().all():
+                df[column] = day_numbers(df[column])
+    if prices:
+        for column in PRICE_COLUMNS:
+            if column in df.columns and df[column].dtype == np.float64:
+                df[column] = float32_if_exact(df[column].to_numpy())
+    return df
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def memory_report(frames):
+    """Deep memory use of each frame before and after compact_frame(), as a DataFrame."""
+    rows = []
+    for name, df in frames.items():
+        compact = compact_frame(df)
+        rows.append({
+            "dataset": name,
+            "rows": len(df),
+            "original_mb": round(memory_mb(df), 2),
+            "compact_mb": round(memory_mb(compact), 2),
+            "reduction": f"{memory_mb(df) / memory_mb(compact):.1f}x" if len(df) else "-",
+            "dtypes": ", ".join(f"{column}:{dtype}" for column, dtype in compact.dtypes.items()
+                                if dtype != df[column].dtype),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the memory saved by the compact dtype profile.")
+    parser.add_argument("--symbols", type=int, default=None,
+                        help="measure a synthetic universe of this many symbols instead of data/")
+    parser.add_argument("--years", type=int, default=20, help="years of synthetic prices (default: 20)")
+    args = parser.parse_args()
+
+    if args.symbols:
+        from generate_synthetic_data import generate
+        frames = generate(n_symbols=args.symbols, years=args.years)
+    else:
+        import storage
+        frames = {name: storage.read_dataset(name) for name in storage.DATASETS}
+        frames = {name: df for name, df in frames.items() if df is not None}
+    report = memory_report(frames)
+    print(report.to_string(index=False))
+    print(f"\nTotal: {report['original_mb'].sum():.1f} MB -> {report['compact_mb'].sum():.1f} MB")
@@ -0,0 +1,261 @@
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from av_client import build_client, fetch_argument_parser
+from fetch_checkpoint import FetchCheckpoint, fetch_resumable, parse_results, save_frames
+from instrumentation import count, counters, reset_counters
+from universe import load_universe, parse_shard, shard_symbols, universe_order
+import argparse
+import fetch_balance_sheets
+import fetch_company_overviews
+import fetch_earnings
+import fetch_income_statements
+import fetch_stock_prices
+import pandas as pd
+import storage
+
+
+#==================================================
+#        FETCH ALL ENDPOINTS CONCURRENTLY
+#==================================================
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+FETCHERS = [
+    fetch_balance_sheets,
+    fetch_company_overviews,
+    fetch_earnings,
+    fetch_income_statements,
+    fetch_stock_prices,
+]
+
+# {function: parse_response}, to check responses before they are checkpointed
+PARSERS = {fetcher.FUNCTION: fetcher.parse_response for fetcher in FETCHERS}
+
+
+def parse_all(client, incremental=False, symbols=None, checkpoint=None):
+    """Fetch every endpoint family for `symbols` (default: the universe) through one client and parse it.
+
+    All jobs share the client's rate limiter and connection pool, so the five
+    families are fetched at once. Responses already in `checkpoint` are not
+    requested again. Returns {module name: {dataset: DataFrame}, or None if
+    any symbol of that family failed}.
+    """
+    symbols = symbols if symbols is not None else load_universe()
+    jobs = []
+    for fetcher in FETCHERS:
+        if fetcher is fetch_stock_prices:
+            jobs.extend(fetcher.build_jobs(symbols, incremental=incremental))
+        else:
+            jobs.extend(fetcher.build_jobs(symbols))
+
+    print(f"Fetching {len(jobs)} endpoints for {len(FETCHERS)} datasets...")
+    results = fetch_resumable(client, jobs, PARSERS, checkpoint)
+
+    return {fetcher.__name__: parse_results(fetcher, [result for result in results if result[0][0] == fetcher.FUNCTION])
+            for fetcher in FETCHERS}
+
+
+def save_all(parsed, incremental=False):
+    """Write the parsed datasets of every family that succeeded. Returns {module name: saved}."""
+    saved = {}
+    for fetcher in FETCHERS:
+        frames = parsed[fetcher.__name__]
+        if frames is not None:
+            save_frames(fetcher, frames, incremental=incremental)
+        saved[fetcher.__name__] = frames is not None
+    return saved
+
+
+def run_checkpoint(replay=False, resume=True):
+    """Checkpoint of the fetch run (None for replays), emptied first unless resuming."""
+    if replay:
+        return None
+    checkpoint = FetchCheckpoint()
+    if not resume:
+        checkpoint.clear()
+    return checkpoint
+
+
+def finish_run(checkpoint, saved, functions=None):
+    """Drop the checkpoints of `functions` (default: all) once every family was written; otherwise keep them."""
+    if checkpoint is None:
+        return
+    if saved and all(saved.values()):
+        checkpoint.clear(functions)
+    else:
+        failed = [name for name, ok in saved.items() if not ok]
+        print(f"Unfinished families: {', '.join(failed) or 'all'}. Rerun to fetch only the missing responses.")
+
+
+def fetch_all(client, incremental=False, resume=True):
+    """Fetch and save every endpoint family for the universe. Returns {module name: saved successfully}.
+
+    With `incremental`, stock prices only fetch and append new trading days.
+    Responses are checkpointed as they arrive and kept until every family is
+    saved, so a rerun after a failure only requests the missing responses.
+    """
+    checkpoint = run_checkpoint(client.replay, resume)
+    saved = save_all(parse_all(client, incremental=incremental, checkpoint=checkpoint), incremental=incremental)
+    finish_run(checkpoint, saved)
+    return saved
+
+
+#==================================================
+#              SHARDED FETCHING
+#==================================================
+
+def fetch_shard(shard, shards, symbols, replay=False, use_cache=True, incremental=False):
+    """Fetch and parse one shard of the universe in a worker process.
+
+    Returns (parse_all() result or None without an API key, the worker's
+    instrumentation counters).
+    """
+    reset_counters()
+    client = build_client(BASE_DIR, replay=replay, use_cache=use_cache, shard=shard, shards=shards)
+    if client is None:
+        return None, {}
+    checkpoint = None if replay else FetchCheckpoint()
+    with client:
+        return parse_all(client, incremental=incremental, symbols=symbols, checkpoint=checkpoint), counters()
+
+
+def merge_frames(frames, symbols):
+    """Concatenate per-shard frames of one dataset in universe order, keeping categorical symbols."""
+    if all(isinstance(df["symbol"].dtype, pd.CategoricalDtype) for df in frames):
+        categories = sorted(set().union(*(df["symbol"].cat.categories for df in frames)))
+        frames = [df.astype({"symbol": pd.CategoricalDtype(categories)}) for df in frames]
+    return universe_order(pd.concat(frames, ignore_index=True), symbols)
+
+
+def merge_shards(shard_results, symbols):
+    """Combine the parse_all() results of every shard, as if the universe had been fetched at once.
+
+    A family is only kept if it succeeded in every shard.
+    """
+    merged = {}
+    for fetcher in FETCHERS:
+        shard_frames = [parsed[fetcher.__name__] for parsed in shard_results]
+        if any(frames is None for frames in shard_frames):
+            merged[fetcher.__name__] = None
+            continue
+        merged[fetcher.__name__] = {name: merge_frames([frames[name] for frames in shard_frames], symbols)
+                                    for name in shard_frames[0]}
+    return merged
+
+
+def fetch_sharded(shards, replay=False, use_cache=True, incremental=False, resume=True):
+    """Split the universe into `shards` and fetch and parse each in its own process.
+
+    Shard i uses API key i (cycling through ALPHA_VANTAGE_API_KEYS), and the
+    shards sharing a key split its rate limits. The merged datasets are
+    written once all shards are done. Returns {module name: saved successfully}.
+    """
+    symbols = load_universe()
+    work = [(shard, shard_list) for shard, shard_list in enumerate(shard_symbols(symbols, shards)) if shard_list]
+    print(f"Fetching {len(symbols)} symbols in {len(work)} shards...")
+    checkpoint = run_checkpoint(replay, resume)
+    with ProcessPoolExecutor(max_workers=len(work)) as pool:
+        outcomes = list(pool.map(fetch_shard, [shard for shard, _ in work], [shards] * len(work),
+                                 [shard_list for _, shard_list in work], [replay] * len(work),
+                                 [use_cache] * len(work), [incremental] * len(work)))
+
+    for _, worker_counters in outcomes:
+        for name, value in worker_counters.items():
+            count(name, value)
+    if any(parsed is None for parsed, _ in outcomes):
+        print("No valid API key found. Existing data will be used instead.")
+        return {}
+    saved = save_all(merge_shards([parsed for parsed, _ in outcomes], symbols), incremental=incremental)
+    finish_run(checkpoint, saved)
+    return saved
+
+
+def save_symbols(parsed, incremental=False):
+    """Write the parsed datasets of every family that succeeded in place of the stored rows of their symbols.
+
+    Rows of other symbols are kept (storage.replace_symbols()); incremental
+    prices are appended as in save_all(). Returns {module name: saved}.
+    """
+    saved = {}
+    for fetcher in FETCHERS:
+        frames = parsed[fetcher.__name__]
+        if frames is not None:
+            if fetcher is fetch_stock_prices and incremental:
+                fetcher.save_frames(frames, incremental=True)
+            else:
+                for name, df in frames.items():
+                    storage.replace_symbols(df, name)
+        saved[fetcher.__name__] = frames is not None
+    return saved
+
+
+def fetch_one_shard(shard, shards, replay=False, use_cache=True, incremental=False, resume=True):
+    """Fetch and save only shard `shard` of `shards`, e.g. one per machine. Returns {module name: saved}.
+
+    The shard uses the same symbols and API key as in fetch_sharded(), and
+    only the rows of its symbols are written, so the data/ folders of the
+    machines can be combined afterwards (file by file with DATA_LAYOUT=partitioned).
+    """
+    symbols = shard_symbols(load_universe(), shards)[shard]
+    if not symbols:
+        print(f"Shard {shard}/{shards} has no symbols. Nothing was fetched.")
+        return {}
+    client = build_client(BASE_DIR, replay=replay, use_cache=use_cache, shard=shard, shards=shards)
+    if client is None:
+        print("No valid API key found. Existing data will be used instead.")
+        return {}
+
+    print(f"Fetching shard {shard}/{shards}: {len(symbols)} symbols...")
+    checkpoint = run_checkpoint(replay, resume)
+    with client:
+        parsed = parse_all(client, incremental=incremental, symbols=symbols, checkpoint=checkpoint)
+    saved = save_symbols(parsed, incremental=incremental)
+    finish_run(checkpoint, saved)
+    return saved
+
+
+def shard_argument(text):
+    """argparse type of the --shard option."""
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(replay=False, use_cache=True, incremental=False, shards=1, resume=True, shard=None):
+    if shard is not None:
+        return fetch_one_shard(*shard, replay=replay, use_cache=use_cache, incremental=incremental, resume=resume)
+    if shards > 1:
+        return fetch_sharded(shards, replay=replay, use_cache=use_cache, incremental=incremental, resume=resume)
+
+    client = build_client(BASE_DIR, replay=replay, use_cache=use_cache)
+
+    # Stop execution if no API key is found
+    if client is None:
+        print("No valid API key found. Existing data will be used instead.")
+        return
+
+    with client:
+        return fetch_all(client, incremental=incremental, resume=resume)
+
+
+if __name__ == "__main__":
+    parser = fetch_argument_parser("Fetch all Alpha Vantage datasets concurrently.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append only stock price trading days newer than those already stored")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the universe into this many shards fetched by parallel worker processes")
+    parser.add_argument("--shard", type=shard_argument, default=None, metavar="I/N",
+                        help="fetch only shard I (from 0) of N and write just its symbols, e.g. one per machine")
+    args = parser.parse_args()
+    if args.shard is not None and args.shards > 1:
+        parser.error("--shard cannot be combined with --shards")
+    main(replay=args.replay, use_cache=not args.no_cache, incremental=args.incremental, shards=args.shards,
+         resume=not args.no_resume, shard=args.shard)
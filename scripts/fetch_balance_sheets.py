@@ -1,9 +1,9 @@
 from pathlib import Path
-from dotenv import load_dotenv
 from datetime import datetime
-import requests
+from av_client import fetch_argument_parser
+from fetch_checkpoint import fetch_main
+from universe import load_universe
 import pandas as pd
-import os
 import sys
 
 
@@ -20,10 +20,6 @@ except NameError:
 if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
 
-# Manage output paths
-output_path = BASE_DIR / "data" / "balance_sheets.csv"
-output_path.parent.mkdir(parents=True, exist_ok=True)
-
 # Helper function where integer values are reported as 'None'
 def safe_int(val):
     try:
@@ -33,18 +29,10 @@ def safe_int(val):
     except (ValueError, TypeError):
         return 0
 
-# Load API key from environment variable
-load_dotenv(BASE_DIR / ".env")
-API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-
-# Stop execution if no API key is found
-if not API_KEY or API_KEY == "your_actual_api_key_here":
-    print("No valid API key found. Existing balance sheet data will be used instead.")
-    sys.exit()
-    
-# Fetch data if API key exists
-SYMBOLS = ["JNJ", "PFE", "UNH", "MDT"]
-balance_sheets = []
+DESCRIPTION = "balance sheets"
+EXISTING_DATA = "balance sheet data"
+FUNCTION = "BALANCE_SHEET"
+SYMBOLS = load_universe()
 
 numeric_fields = [
     "totalAssets", "totalCurrentAssets", "cashAndCashEquivalentsAtCarryingValue", "cashAndShortTermInvestments", 
@@ -58,56 +46,58 @@ numeric_fields = [
     "commonStockSharesOutstanding"
     ]
 
-for SYMBOL in SYMBOLS:
-    URL = f"https://www.alphavantage.co/query?function=BALANCE_SHEET&symbol={SYMBOL}&apikey={API_KEY}"
-    print(f"Fetching balance sheets for {SYMBOL}...")
-    try:
-        response = requests.get(URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Check if response contains valid data
-        if "annualReports" not in data:
-            print(f"API request failed for {SYMBOL}. Existing balance sheet data will be used instead.")
-            sys.exit()
+
+def build_jobs(symbols=SYMBOLS):
+    return [(FUNCTION, symbol, {}) for symbol in symbols]
+
+
+def parse_response(symbol, data):
+    """Extract balance sheet rows for one symbol, or None if the response has no reports."""
+    if "annualReports" not in data:
+        return None
+
+    balance_sheets = []
+    reports = ["annualReports", "quarterlyReports"]
+    for report in reports:
+        for report_entry in data[report]:
+            report_type = "annual" if report == "annualReports" else "quarterly"
+            try:
+                fiscal_date = datetime.strptime(report_entry.get("fiscalDateEnding"), "%Y-%m-%d")
+            except (TypeError, ValueError):
+                fiscal_date = None
             
-        print(f"Balance sheets fetched successfully for {SYMBOL}!")
-        
-        # Extract balance sheets
-        reports = ["annualReports", "quarterlyReports"]
-        for report in reports:
-            for report_entry in data[report]:
-                symbol = SYMBOL
-                report_type = "annual" if report == "annualReports" else "quarterly"
-                try:
-                    fiscal_date = datetime.strptime(report_entry.get("fiscalDateEnding"), "%Y-%m-%d")
-                except (TypeError, ValueError):
-                    fiscal_date = None
-                
-                reported_currency = report_entry.get("reportedCurrency")
-                                
-                numeric_values = [safe_int(report_entry.get(field)) for field in numeric_fields]
-                
-                balance_sheets.append([
-                    symbol,
-                    report_type,
-                    fiscal_date,
-                    reported_currency,
-                    *numeric_values  # Unpack all numeric values in order
-                    ])
-
-    except (requests.exceptions.RequestException, ValueError) as e:
-        print(f"API request error for {SYMBOL}: {e}. Existing balance sheet data will be used instead.")
-        sys.exit()
-
-balance_sheets_df = pd.DataFrame(balance_sheets, columns=[
-    "symbol", 
-    "report_type", 
-    "fiscal_date", 
-    "reported_currency",
-    *numeric_fields
-    ])        
-        
-# Save DataFrames to CSV
-balance_sheets_df.to_csv(output_path, index=False)
+            reported_currency = report_entry.get("reportedCurrency")
+                            
+            numeric_values = [safe_int(report_entry.get(field)) for field in numeric_fields]
+            
+            balance_sheets.append([
+                symbol,
+                report_type,
+                fiscal_date,
+                reported_currency,
+                *numeric_values  # Unpack all numeric values in order
+                ])
+    return balance_sheets
+
+
+def build_frames(parsed):
+    """{dataset: DataFrame} of the {symbol: rows} from parse_response()."""
+    balance_sheets = [row for rows in parsed.values() for row in rows]
+    balance_sheets_df = pd.DataFrame(balance_sheets, columns=[
+        "symbol", 
+        "report_type", 
+        "fiscal_date", 
+        "reported_currency",
+        *numeric_fields
+        ])        
+            
+    return {"balance_sheets": balance_sheets_df}
+
+
+def main(replay=False, use_cache=True, resume=True):
+    return fetch_main(sys.modules[__name__], replay=replay, use_cache=use_cache, resume=resume)
+
 
+if __name__ == "__main__":
+    args = fetch_argument_parser("Fetch balance sheets from Alpha Vantage.").parse_args()
+    main(replay=args.replay, use_cache=not args.no_cache, resume=not args.no_resume)
@@ -0,0 +1,182 @@
+from pathlib import Path
+from av_client import build_client
+from instrumentation import count
+from response_cache import ResponseCache
+from storage import write_dataset
+import shutil
+
+
+#==================================================
+#              FETCH CHECKPOINTS
+#==================================================
+
+# Responses of an unfinished fetch run, saved per symbol and endpoint as soon
+# as each one arrives and parses. A rerun after a failed or interrupted run
+# restores them and only requests what is still missing, so quota spent on the
+# symbols that succeeded is not spent again. An endpoint's checkpoints are
+# removed once its datasets have been written to data/. Checkpoints expire like
+# cached responses (see response_cache.py), so an old run is not resumed with
+# stale data.
+#
+# The fetch_* modules only define their endpoint: FUNCTION, build_jobs(),
+# parse_response() and build_frames(), plus DESCRIPTION and EXISTING_DATA for
+# the progress messages. fetch_main() runs one of them on its own, and
+# parse_results() and save_frames() are shared with fetch_all.py.
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+CHECKPOINT_DIR = BASE_DIR / "cache" / "checkpoints"
+
+
+class FetchCheckpoint:
+    """Responses of the jobs completed by an unfinished run, one file per job."""
+
+    def __init__(self, checkpoint_dir=CHECKPOINT_DIR):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.store = ResponseCache(self.checkpoint_dir)
+
+    def completed(self, jobs):
+        """Checkpointed response of each `(function, symbol, params)` job, or None, in the order of `jobs`."""
+        return [self.store.get(function, symbol, params) for function, symbol, params in jobs]
+
+    def record(self, job, data):
+        function, symbol, params = job
+        self.store.put(function, symbol, params, data)
+
+    def clear(self, functions=None):
+        """Remove the checkpoints of `functions` (default: all), e.g. once their datasets are saved."""
+        if functions is None:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            return
+        for function in functions:
+            shutil.rmtree(self.checkpoint_dir / function, ignore_errors=True)
+
+
+def response_parses(parsers, job, data):
+    """True if the `parse_response(symbol, data)` of the job's function in `parsers` accepts `data`."""
+    function, symbol, _ = job
+    try:
+        return parsers[function](symbol, data) is not None
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def fetch_resumable(client, jobs, parsers, checkpoint=None):
+    """Fetch `jobs` with client.fetch_many(), resuming from `checkpoint`.
+
+    Jobs with a checkpointed response are not requested again, and every new
+    response that parses (see response_parses()) is checkpointed as soon as it
+    arrives. Returns `(job, data, error)` tuples in the order of `jobs`.
+    """
+    if checkpoint is None:
+        return client.fetch_many(jobs)
+
+    restored = checkpoint.completed(jobs)
+    pending = [job for job, data in zip(jobs, restored) if data is None]
+    if len(pending) < len(jobs):
+        count("api_checkpoint_hits", len(jobs) - len(pending))
+        print(f"Resuming an unfinished run: {len(jobs) - len(pending)} of {len(jobs)} responses restored")
+
+    def on_result(job, data):
+        if response_parses(parsers, job, data):
+            checkpoint.record(job, data)
+
+    fetched = iter(client.fetch_many(pending, on_result=on_result))
+    return [(job, data, None) if data is not None else next(fetched) for job, data in zip(jobs, restored)]
+
+
+def run_jobs(client, jobs, parsers, save_results, resume=True):
+    """Fetch `jobs` resumably and write them with `save_results(results)`. Returns whether they were saved.
+
+    Without `resume`, checkpoints left by an unfinished run are discarded
+    first. Replays only read the response cache and use no checkpoints.
+    """
+    checkpoint = None if client.replay else FetchCheckpoint()
+    if checkpoint is not None and not resume:
+        checkpoint.clear(parsers)
+    saved = save_results(fetch_resumable(client, jobs, parsers, checkpoint))
+    if saved and checkpoint is not None:
+        checkpoint.clear(parsers)
+    return saved
+
+
+#==================================================
+#              SHARED FETCHER STEPS
+#==================================================
+
+def parse_results(fetcher, results):
+    """Parse a fetcher's `(job, data, error)` results into {dataset: DataFrame}.
+
+    Every response goes through fetcher.parse_response() and the parsed
+    symbols through fetcher.build_frames(). Returns None unless every symbol
+    was fetched and parsed successfully.
+    """
+    parsed = {}
+    for (_, symbol, _), data, error in results:
+        if error is not None:
+            print(f"API request error for {symbol}: {error}. Existing {fetcher.EXISTING_DATA} will be used instead.")
+            return None
+
+        try:
+            symbol_data = fetcher.parse_response(symbol, data)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"API request error for {symbol}: {e}. Existing {fetcher.EXISTING_DATA} will be used instead.")
+            return None
+
+        if symbol_data is None:
+            print(f"API request failed for {symbol}. Existing {fetcher.EXISTING_DATA} will be used instead.")
+            return None
+
+        print(f"{fetcher.DESCRIPTION.capitalize()} fetched successfully for {symbol}!")
+        parsed[symbol] = symbol_data
+    return fetcher.build_frames(parsed)
+
+
+def save_frames(fetcher, frames, **options):
+    """Write parsed frames with the fetcher's own save_frames(frames, **options), or each to its dataset."""
+    if hasattr(fetcher, "save_frames"):
+        fetcher.save_frames(frames, **options)
+        return
+    # Save DataFrames in the configured data format
+    for name, df in frames.items():
+        write_dataset(df, name)
+
+
+def fetch_and_save(fetcher, client, resume=True, **options):
+    """Fetch one fetcher's jobs for the universe with `client` and write its datasets.
+
+    `options` go to the fetcher's build_jobs() and save_frames(), e.g.
+    incremental for stock prices. Nothing is written unless every symbol was
+    fetched successfully. Returns whether the datasets were saved.
+    """
+    def save_results(results):
+        frames = parse_results(fetcher, results)
+        if frames is None:
+            return False
+        save_frames(fetcher, frames, **options)
+        return True
+
+    jobs = fetcher.build_jobs(**options)
+    for _, symbol, params in jobs:
+        details = f" ({', '.join(map(str, params.values()))})" if params else ""
+        print(f"Fetching {fetcher.DESCRIPTION} for {symbol}{details}...")
+    return run_jobs(client, jobs, {fetcher.FUNCTION: fetcher.parse_response}, save_results, resume=resume)
+
+
+def fetch_main(fetcher, replay=False, use_cache=True, resume=True, **options):
+    """Run one fetcher on its own with a new client, as its script does. Returns whether it saved."""
+    client = build_client(BASE_DIR, replay=replay, use_cache=use_cache)
+
+    # Stop execution if no API key is found
+    if client is None:
+        print(f"No valid API key found. Existing {fetcher.EXISTING_DATA} will be used instead.")
+        return False
+    with client:
+        return fetch_and_save(fetcher, client, resume=resume, **options)
@@ -1,9 +1,8 @@
 from pathlib import Path
-from dotenv import load_dotenv
-import requests
+from av_client import fetch_argument_parser
+from fetch_checkpoint import fetch_main
+from universe import load_universe
 import pandas as pd
-import os
-import json
 import sys
 
 
@@ -20,66 +19,54 @@ except NameError:
 if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
 
-# Manage output path
-output_path = BASE_DIR / "data" / "company_overviews.csv"
-output_path.parent.mkdir(parents=True, exist_ok=True)
-
-# Load API key from environment variable
-load_dotenv(BASE_DIR / ".env")
-API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-
-# Stop execution if no API key is found
-if not API_KEY or API_KEY == "your_actual_api_key_here":
-    print("No valid API key found. Existing company overview data will be used instead.")
-    sys.exit()
-    
-# Fetch data if API key exists
-SYMBOLS = ["JNJ", "PFE", "UNH", "MDT"]
-company_overviews = []
-
-for SYMBOL in SYMBOLS:
-    URL = f"https://www.alphavantage.co/query?function=OVERVIEW&symbol={SYMBOL}&apikey={API_KEY}"
-    print(f"Fetching overview data for {SYMBOL}...")
-    try:
-        response = requests.get(URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Check if response contains valid data
-        if "Symbol" not in data:
-            print(f"API request failed for {SYMBOL}. Existing company overview data will be used instead.")
-            sys.exit()
-            
-        print(f"Overview data fetched successfully for {SYMBOL}!")
-        
-        # Process individual response: Ensure consistent data types
-        processed_data = {
-            "symbol": SYMBOL,
-            "Name": data.get("Name", "Unknown"),
-            "CIK": int(float(data.get("CIK") or 0)),
-            "MarketCapitalization": int(float(data.get("MarketCapitalization") or 0)),
-            "EBITDA": int(float(data.get("EBITDA") or 0)),
-            "PERatio": float(data.get("PERatio") or 0),
-            "PEGRatio": float(data.get("PEGRatio") or 0),
-            "EPS": float(data.get("EPS") or 0),
-            "ProfitMargin": float(data.get("ProfitMargin") or 0),
-            "ReturnOnEquityTTM": float(data.get("ReturnOnEquityTTM") or 0),
-            "RevenueTTM": int(data.get("RevenueTTM") or 0),
-            "QuarterlyEarningsGrowthYOY": float(data.get("QuarterlyEarningsGrowthYOY") or 0),
-            "QuarterlyRevenueGrowthYOY": float(data.get("QuarterlyRevenueGrowthYOY") or 0),
-            "PriceToBookRatio": float(data.get("PriceToBookRatio") or 0),
-            "DividendYield": float(data.get("DividendYield") or 0),
-            "Beta": float(data.get("Beta") or 0)
-        }
-        
-        company_overviews.append(processed_data)
-      
-    except (requests.exceptions.RequestException, ValueError) as e:
-        print(f"API request error for {SYMBOL}: {e}. Existing company overview data will be used instead.")
-        sys.exit()
-
-# Create data frame
-all_company_overviews = pd.DataFrame.from_records(company_overviews)
-
-# Save DataFrame to CSV
-all_company_overviews.to_csv(output_path, index=False)
+DESCRIPTION = "overview data"
+EXISTING_DATA = "company overview data"
+FUNCTION = "OVERVIEW"
+SYMBOLS = load_universe()
+
+
+def build_jobs(symbols=SYMBOLS):
+    return [(FUNCTION, symbol, {}) for symbol in symbols]
+
+
+def parse_response(symbol, data):
+    """Extract the overview record for one symbol, or None if the response has no overview."""
+    if "Symbol" not in data:
+        return None
+
+    # Process individual response: Ensure consistent data types
+    return {
+        "symbol": symbol,
+        "Name": data.get("Name", "Unknown"),
+        "CIK": int(float(data.get("CIK") or 0)),
+        "MarketCapitalization": int(float(data.get("MarketCapitalization") or 0)),
+        "EBITDA": int(float(data.get("EBITDA") or 0)),
+        "PERatio": float(data.get("PERatio") or 0),
+        "PEGRatio": float(data.get("PEGRatio") or 0),
+        "EPS": float(data.get("EPS") or 0),
+        "ProfitMargin": float(data.get("ProfitMargin") or 0),
+        "ReturnOnEquityTTM": float(data.get("ReturnOnEquityTTM") or 0),
+        "RevenueTTM": int(data.get("RevenueTTM") or 0),
+        "QuarterlyEarningsGrowthYOY": float(data.get("QuarterlyEarningsGrowthYOY") or 0),
+        "QuarterlyRevenueGrowthYOY": float(data.get("QuarterlyRevenueGrowthYOY") or 0),
+        "PriceToBookRatio": float(data.get("PriceToBookRatio") or 0),
+        "DividendYield": float(data.get("DividendYield") or 0),
+        "Beta": float(data.get("Beta") or 0)
+    }
+
+
+def build_frames(parsed):
+    """{dataset: DataFrame} of the {symbol: record} from parse_response()."""
+    # Create data frame
+    all_company_overviews = pd.DataFrame.from_records(list(parsed.values()))
+
+    return {"company_overviews": all_company_overviews}
+
+
+def main(replay=False, use_cache=True, resume=True):
+    return fetch_main(sys.modules[__name__], replay=replay, use_cache=use_cache, resume=resume)
+
+
+if __name__ == "__main__":
+    args = fetch_argument_parser("Fetch company overviews from Alpha Vantage.").parse_args()
+    main(replay=args.replay, use_cache=not args.no_cache, resume=not args.no_resume)
@@ -1,10 +1,9 @@
 from pathlib import Path
-from dotenv import load_dotenv
 from datetime import datetime
-import requests
+from av_client import fetch_argument_parser
+from fetch_checkpoint import fetch_main
+from universe import load_universe
 import pandas as pd
-import os
-import json
 import sys
 
 
@@ -21,10 +20,6 @@ except NameError:
 if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
 
-# Manage output paths
-output_path = BASE_DIR / "data" / "income_statements.csv"
-output_path.parent.mkdir(parents=True, exist_ok=True)
-
 # Helper function where integer values are reported as 'None'
 def safe_int(val):
     try:
@@ -34,18 +29,10 @@ def safe_int(val):
     except (ValueError, TypeError):
         return 0
 
-# Load API key from environment variable
-load_dotenv(BASE_DIR / ".env")
-API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-
-# Stop execution if no API key is found
-if not API_KEY or API_KEY == "your_actual_api_key_here":
-    print("No valid API key found. Existing income data will be used instead.")
-    sys.exit()
-    
-# Fetch data if API key exists
-SYMBOLS = ["JNJ", "PFE", "UNH", "MDT"]
-income_statements = []
+DESCRIPTION = "income statements"
+EXISTING_DATA = "income data"
+FUNCTION = "INCOME_STATEMENT"
+SYMBOLS = load_universe()
 
 numeric_fields = [
     "grossProfit", "totalRevenue", "costOfRevenue", "costofGoodsAndServicesSold",
@@ -57,71 +44,58 @@ numeric_fields = [
     "ebit", "ebitda", "netIncome"
     ]
 
-for SYMBOL in SYMBOLS:
-    URL = f"https://www.alphavantage.co/query?function=INCOME_STATEMENT&symbol={SYMBOL}&apikey={API_KEY}"
-    print(f"Fetching income statements for {SYMBOL}...")
-    try:
-        response = requests.get(URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Check if response contains valid data
-        if "annualReports" not in data:
-            print(f"API request failed for {SYMBOL}. Existing income data will be used instead.")
-            sys.exit()
-            
-        print(f"Income statements fetched successfully for {SYMBOL}!")
-        
-        # Extract income statements
-        reports = ["annualReports", "quarterlyReports"]
-        for report in reports:
-            for report_entry in data[report]:
-                symbol = SYMBOL
-                report_type = "annual" if report == "annualReports" else "quarterly"
-                try:
-                    fiscal_date = datetime.strptime(report_entry.get("fiscalDateEnding"), "%Y-%m-%d")
-                except (TypeError, ValueError):
-                    fiscal_date = None
-                
-                reported_currency = report_entry.get("reportedCurrency")
-                                
-                numeric_values = [safe_int(report_entry.get(field)) for field in numeric_fields]
-                
-                income_statements.append([
-                    symbol,
-                    report_type,
-                    fiscal_date,
-                    reported_currency,
-                    *numeric_values  # Unpack all numeric values in order
-                    ])
-
-    except (requests.exceptions.RequestException, ValueError) as e:
-        print(f"API request error for {SYMBOL}: {e}. Existing income data will be used instead.")
-        sys.exit()
-
-income_statements_df = pd.DataFrame(income_statements, columns=[
-    "symbol", 
-    "report_type", 
-    "fiscal_date", 
-    "reported_currency",
-    *numeric_fields
-    ])        
-        
-# Save DataFrames to CSV
-income_statements_df.to_csv(output_path, index=False)
-
-
-
-
-
-
-
-
 
+def build_jobs(symbols=SYMBOLS):
+    return [(FUNCTION, symbol, {}) for symbol in symbols]
 
 
+def parse_response(symbol, data):
+    """Extract income statement rows for one symbol, or None if the response has no reports."""
+    if "annualReports" not in data:
+        return None
 
+    income_statements = []
+    reports = ["annualReports", "quarterlyReports"]
+    for report in reports:
+        for report_entry in data[report]:
+            report_type = "annual" if report == "annualReports" else "quarterly"
+            try:
+                fiscal_date = datetime.strptime(report_entry.get("fiscalDateEnding"), "%Y-%m-%d")
+            except (TypeError, ValueError):
+                fiscal_date = None
+            
+            reported_currency = report_entry.get("reportedCurrency")
+                            
+            numeric_values = [safe_int(report_entry.get(field)) for field in numeric_fields]
+            
+            income_statements.append([
+                symbol,
+                report_type,
+                fiscal_date,
+                reported_currency,
+                *numeric_values  # Unpack all numeric values in order
+                ])
+    return income_statements
+
+
+def build_frames(parsed):
+    """{dataset: DataFrame} of the {symbol: rows} from parse_response()."""
+    income_statements = [row for rows in parsed.values() for row in rows]
+    income_statements_df = pd.DataFrame(income_statements, columns=[
+        "symbol", 
+        "report_type", 
+        "fiscal_date", 
+        "reported_currency",
+        *numeric_fields
+        ])        
+            
+    return {"income_statements": income_statements_df}
 
 
+def main(replay=False, use_cache=True, resume=True):
+    return fetch_main(sys.modules[__name__], replay=replay, use_cache=use_cache, resume=resume)
 
 
+if __name__ == "__main__":
+    args = fetch_argument_parser("Fetch income statements from Alpha Vantage.").parse_args()
+    main(replay=args.replay, use_cache=not args.no_cache, resume=not args.no_resume)
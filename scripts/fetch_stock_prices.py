@@ -1,9 +1,14 @@
 from pathlib import Path
-from dotenv import load_dotenv
-import requests
+from av_client import fetch_argument_parser
+from fetch_checkpoint import fetch_main
+from compact_dtypes import smallest_integer
+from datetime import date
+from instrumentation import count
+from operator import itemgetter
+from storage import data_format, data_layout, find_dataset, format_of, latest_dates, read_dataset, stored_layout, write_dataset
+from universe import load_universe
+import numpy as np
 import pandas as pd
-import os
-import json
 import sys
 
 
@@ -20,79 +25,139 @@ except NameError:
 if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
 
-# Manage output path
-output_path = BASE_DIR / "data" / "stock_prices.csv"
-output_path.parent.mkdir(parents=True, exist_ok=True)
-
-# Load API key from environment variable
-load_dotenv(BASE_DIR / ".env")
-API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
-
-# Stop execution if no API key is found
-if not API_KEY or API_KEY == "your_actual_api_key_here":
-    print("No valid API key found. Existing stock price data will be used instead.")
-    sys.exit()
-
-# Fetch data if API key exists
-SYMBOLS = ["JNJ", "PFE", "UNH", "MDT"]
-all_stock_prices = []
-
-for SYMBOL in SYMBOLS:
-    URL = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={SYMBOL}&outputsize=full&apikey={API_KEY}"
-    print(f"Fetching stock prices for {SYMBOL}...")
-    try:
-        response = requests.get(URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Check if response contains valid data
-        if "Time Series (Daily)" not in data:
-            print(f"API request failed for {SYMBOL}. Existing stock price data will be used instead.")
-            sys.exit()
-            
-        print(f"Stock prices fetched successfully for {SYMBOL}!")
-        
-        # Extract stock prices
-        stock_prices = []
-        for date, values in data["Time Series (Daily)"].items():
-            stock_prices.append([
-                SYMBOL,
-                date,
-                float(values["1. open"]),
-                float(values["2. high"]),
-                float(values["3. low"]),
-                float(values["4. close"]),
-                float(values["5. volume"]),
-                ])
-            
-        all_stock_prices.extend(stock_prices)
-        
-    except (requests.exceptions.RequestException, ValueError) as e:
-        print(f"API request error for {SYMBOL}: {e}. Existing stock price data will be used instead.")
-        sys.exit()
-
-# Convert to DataFrame
-df = pd.DataFrame(all_stock_prices, columns=["symbol", "date", "open", "high", "low", "close", "volume"])
-
-# Save DataFrame to CSV
-df.to_csv(output_path, index=False)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+DATASET = "stock_prices"
+DESCRIPTION = "stock prices"
+EXISTING_DATA = "stock price data"
+FUNCTION = "TIME_SERIES_DAILY"
+SYMBOLS = load_universe()
+COLUMNS = ["symbol", "date", "open", "high", "low", "close", "volume"]
+
+# {column: field of a TIME_SERIES_DAILY day}
+PRICE_FIELDS = {
+    "open": "1. open",
+    "high": "2. high",
+    "low": "3. low",
+    "close": "4. close",
+    "volume": "5. volume",
+}
+
+# outputsize=compact returns the latest 100 trading days
+COMPACT_DAYS = 100
+
+
+def latest_stored_dates():
+    """Return {symbol: latest date string} for the prices already stored."""
+    return latest_dates(DATASET)
+
+
+def output_size(latest_date, today=None):
+    """Use the small compact payload when it is guaranteed to cover the gap.
+
+    Weekdays since the latest stored date are an upper bound on the number of
+    missing trading days, so a count under 100 means no day can be skipped.
+    """
+    if latest_date is None:
+        return "full"
+    today = today or date.today()
+    gap = np.busday_count(np.datetime64(latest_date, "D"), np.datetime64(today, "D"))
+    return "compact" if gap < COMPACT_DAYS else "full"
+
+
+def build_jobs(symbols=SYMBOLS, incremental=False):
+    latest_dates = latest_stored_dates() if incremental else {}
+    return [(FUNCTION, symbol, {"outputsize": output_size(latest_dates.get(symbol))}) for symbol in symbols]
+
+
+def parse_response(symbol, data):
+    """Extract daily prices for one symbol as {column: NumPy array}, or None if the response has no time series.
+
+    Each field is converted straight into a typed array, without building a
+    Python list per trading day.
+    """
+    series = data.get("Time Series (Daily)")
+    if series is None:
+        return None
+
+    days = len(series)
+    values = list(series.values())
+    columns = {"date": np.fromiter(series, dtype="U10", count=days)}
+    for column, field in PRICE_FIELDS.items():
+        columns[column] = np.fromiter(map(itemgetter(field), values), dtype=np.float64, count=days)
+    return columns
+
+
+def price_frame(parsed):
+    """Concatenate {symbol: columns} from parse_response() into one DataFrame.
+
+    Symbols are categorical and volume is an integer column where every value
+    is a whole number (see compact_dtypes.py); dates stay ISO strings for the
+    stored file.
+    """
+    if not parsed:
+        return pd.DataFrame(columns=COLUMNS)
+    categories = sorted(parsed)
+    days = [len(columns["date"]) for columns in parsed.values()]
+    codes = np.repeat([categories.index(symbol) for symbol in parsed], days)
+    frame = {"symbol": pd.Categorical.from_codes(codes, categories=categories)}
+    for column in COLUMNS[1:]:
+        frame[column] = np.concatenate([columns[column] for columns in parsed.values()])
+    frame["volume"] = smallest_integer(frame["volume"])
+    return pd.DataFrame(frame, columns=COLUMNS)
+
+
+def build_frames(parsed):
+    """{dataset: DataFrame} of the {symbol: columns} from parse_response()."""
+    return {DATASET: price_frame(parsed)}
+
+
+def save_frames(frames, incremental=False):
+    """Write the parsed prices.
+
+    In incremental mode only trading days newer than the latest stored date of
+    each symbol are added, appending to an existing CSV (or merging into the
+    affected year partitions) instead of rewriting it.
+    """
+    df = frames[DATASET]
+    if incremental and stored_layout(DATASET) is not None:
+        append_new_rows(df)
+        return
+
+    # Save DataFrame in the configured data format
+    write_dataset(df, DATASET)
+
+
+def append_new_rows(df):
+    """Append rows newer than the latest stored date per symbol, deduplicated on (symbol, date)."""
+    latest_dates = pd.Series(latest_stored_dates(), name="latest_date")
+    df = df.join(latest_dates, on="symbol")
+    new_rows = df[df["latest_date"].isna() | (df["date"] > df["latest_date"])]
+    new_rows = new_rows.drop_duplicates(subset=["symbol", "date"], keep="last")
+    new_rows = new_rows.sort_values(["symbol", "date"], ascending=[True, False])[COLUMNS]
+
+    layout = stored_layout(DATASET)
+    path = find_dataset(DATASET)
+    if layout == "partitioned" and data_layout() == "partitioned":
+        # Only the partitions of the years that received new days are rewritten
+        path = write_dataset(new_rows, DATASET, merge_on=["symbol", "date"])
+    elif layout == "single" and data_layout() == "single" and format_of(path) == "csv" and data_format() == "csv":
+        new_rows.to_csv(path, mode="a", header=False, index=False)
+        count("rows_out", len(new_rows))
+    else:
+        # Columnar files cannot be appended to in place, and a layout change
+        # needs every row, so rewrite the dataset
+        stored = read_dataset(DATASET)
+        path = write_dataset(pd.concat([stored, new_rows], ignore_index=True), DATASET)
+    print(f"Appended {len(new_rows)} new trading days to {path.name}")
+
+
+def main(replay=False, use_cache=True, incremental=False, resume=True):
+    return fetch_main(sys.modules[__name__], replay=replay, use_cache=use_cache, resume=resume,
+                      incremental=incremental)
+
+
+if __name__ == "__main__":
+    parser = fetch_argument_parser("Fetch stock prices from Alpha Vantage.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append only trading days newer than those already stored")
+    args = parser.parse_args()
+    main(replay=args.replay, use_cache=not args.no_cache, incremental=args.incremental, resume=not args.no_resume)
@@ -0,0 +1,56 @@
+from pathlib import Path
+import argparse
+import matplotlib
+import matplotlib.pyplot as plt
+
+#==================================================
+#               FIGURE OUTPUT
+#==================================================
+
+# Saving and display options shared by the visualize_* scripts: output
+# formats, resolution, and a headless mode that renders with the Agg backend
+# and never opens a window.
+
+DEFAULT_FORMATS = ("png",)
+DEFAULT_DPI = 300
+
+
+def use_headless_backend():
+    """Render off-screen with Agg, so no window opens and show() is skipped."""
+    matplotlib.use("Agg", force=True)
+
+
+def is_headless():
+    return matplotlib.get_backend().lower() == "agg"
+
+
+def save_figure(fig, output_file, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI, show=False):
+    """Save `fig` next to `output_file` in each format, optionally show it, then close it.
+
+    Returns the paths written.
+    """
+    paths = []
+    for fmt in formats:
+        path = Path(output_file).with_suffix(f".{fmt}")
+        fig.savefig(path, format=fmt, dpi=dpi, bbox_inches="tight")
+        paths.append(path)
+
+    if show and not is_headless():
+        plt.show()
+    plt.close("all")  # Free the figure; pooled workers render many figures
+    return paths
+
+
+def run_script(main, description):
+    """Parse the shared figure options and call a visualize script's `main`."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--formats", nargs="+", default=list(DEFAULT_FORMATS),
+                        help="output formats, e.g. png svg pdf (default: png)")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help=f"resolution (default: {DEFAULT_DPI})")
+    parser.add_argument("--headless", action="store_true",
+                        help="render with the Agg backend and do not show the figure")
+    args = parser.parse_args()
+
+    if args.headless:
+        use_headless_backend()
+    main(formats=args.formats, dpi=args.dpi, show=not args.headless)
@@ -0,0 +1,157 @@
+from datetime import date
+from schema import TABLE_DDL
+from storage import DATASETS, write_dataset
+import argparse
+import sqlite3
+import numpy as np
+import pandas as pd
+
+#==================================================
+#            SYNTHETIC MARKET DATA
+#==================================================
+
+# Deterministic generator for datasets with the same columns as data/*.csv,
+# for any number of symbols, years of price history and earnings quarters.
+# The same arguments always produce the same files, so benchmark runs
+# (scripts/benchmark_pipeline.py) are comparable.
+
+# Columns computed by the loader rather than stored in data/
+DERIVED_COLUMNS = {"trading_day"}
+
+
+def dataset_columns(name):
+    """{column: declared type} of a dataset, in order, taken from its table in schema.py."""
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute(TABLE_DDL[name])
+        return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({name})")
+                if row[1] not in DERIVED_COLUMNS}
+    finally:
+        conn.close()
+
+
+def symbol_names(n_symbols):
+    return [f"S{i:04d}" for i in range(n_symbols)]
+
+
+def generate_prices(rng, symbols, days):
+    """Geometric random walk of daily prices per symbol on business days."""
+    n_days = len(days)
+    returns = rng.normal(0.0003, 0.015, size=(len(symbols), n_days))
+    close = 20 + 180 * rng.random((len(symbols), 1)) * np.exp(np.cumsum(returns, axis=1))
+    open_ = close * np.exp(rng.normal(0, 0.01, size=close.shape))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, size=close.shape)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, size=close.shape)))
+    volume = rng.integers(1_000_000, 20_000_000, size=close.shape).astype(float)
+
+    return pd.DataFrame({
+        "symbol": np.repeat(symbols, n_days),
+        "date": np.tile(days.strftime("%Y-%m-%d"), len(symbols)),
+        "open": open_.round(2).ravel(),
+        "high": high.round(2).ravel(),
+        "low": low.round(2).ravel(),
+        "close": close.round(2).ravel(),
+        "volume": volume.ravel(),
+    })
+
+
+def generate_earnings(rng, symbols, quarter_ends, days):
+    """Quarterly EPS reports, each published on a trading day 2-6 weeks after quarter end."""
+    n = len(symbols) * len(quarter_ends)
+    fiscal_quarter = pd.DatetimeIndex(np.tile(quarter_ends, len(symbols)))
+    lag = pd.to_timedelta(rng.integers(14, 42, size=n), unit="D")
+    reported = fiscal_quarter + lag
+
+    # Snap each report date onto the next trading day in the price history
+    position = np.minimum(days.searchsorted(reported), len(days) - 1)
+    reported = days[position]
+
+    estimated = rng.uniform(0.2, 5.0, size=n).round(2)
+    reported_eps = (estimated * (1 + rng.normal(0.03, 0.08, size=n))).round(2)
+    surprise = (reported_eps - estimated).round(2)
+    return pd.DataFrame({
+        "symbol": np.repeat(symbols, len(quarter_ends)),
+        "fiscal_quarter": fiscal_quarter.strftime("%Y-%m-%d"),
+        "reported_date": reported.strftime("%Y-%m-%d"),
+        "reported_EPS": reported_eps,
+        "estimated_EPS": estimated,
+        "surprise": surprise,
+        "surprise_pct": (100 * surprise / estimated).round(4),
+        "report_time": "pre-market",
+    })
+
+
+def generate_statements(rng, symbols, quarter_ends, year_ends, columns):
+    """Annual and quarterly statements with random integer line items."""
+    frames = []
+    for report_type, dates, scale in [("annual", year_ends, 4), ("quarterly", quarter_ends, 1)]:
+        n = len(symbols) * len(dates)
+        df = pd.DataFrame({
+            "symbol": np.repeat(symbols, len(dates)),
+            "report_type": report_type,
+            "fiscal_date": np.tile(dates.strftime("%Y-%m-%d"), len(symbols)),
+            "reported_currency": "USD",
+        })
+        for column in list(columns)[4:]:
+            df[column] = rng.integers(1, 25_000, size=n) * 1_000_000 * scale
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate(n_symbols=4, years=25, quarters=40, seed=0, end_date=None, symbols=None):
+    """Return {dataset name: DataFrame} of synthetic data ending at `end_date` (default today).
+
+    Symbols are named S0000, S0001, ... unless a list of `symbols` is given.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end_date or date.today())
+    symbols = list(symbols) if symbols else symbol_names(n_symbols)
+
+    days = pd.bdate_range(end=end, periods=int(years * 252))
+    quarter_ends = pd.date_range(end=end - pd.offsets.QuarterEnd(1), periods=quarters, freq="QE")
+    year_ends = quarter_ends[quarter_ends.month == 12]
+
+    prices = generate_prices(rng, symbols, days)
+    quarterly = generate_earnings(rng, symbols, quarter_ends, days)
+
+    annual = quarterly.assign(fiscal_year=quarterly["fiscal_quarter"].str[:4] + "-12-31")
+    annual = annual.groupby(["symbol", "fiscal_year"], as_index=False)["reported_EPS"].sum().round(2)
+
+    income = generate_statements(rng, symbols, quarter_ends, year_ends, dataset_columns("income_statements"))
+    balance = generate_statements(rng, symbols, quarter_ends, year_ends, dataset_columns("balance_sheets"))
+    balance["commonStockSharesOutstanding"] = balance["commonStockSharesOutstanding"] // 100
+
+    overviews = pd.DataFrame({"symbol": symbols, "Name": [f"Synthetic Company {s}" for s in symbols]})
+    for column, column_type in list(dataset_columns("company_overviews").items())[2:]:
+        if column_type == "INTEGER":
+            overviews[column] = rng.integers(1_000_000, 500_000_000_000, size=len(symbols))
+        else:
+            overviews[column] = rng.uniform(0.01, 50, size=len(symbols)).round(3)
+
+    datasets = {
+        "stock_prices": prices,
+        "annual_earnings": annual,
+        "quarterly_earnings": quarterly,
+        "income_statements": income,
+        "balance_sheets": balance,
+        "company_overviews": overviews,
+    }
+    return {name: df[list(dataset_columns(name))] for name, df in datasets.items()}
+
+
+def write_all(datasets, fmt=None):
+    """Write generated datasets to data/ (storage.DATA_DIR) in the configured format."""
+    for name in DATASETS:
+        path = write_dataset(datasets[name], name, fmt)
+        print(f"Wrote {len(datasets[name]):>10,} rows to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write deterministic synthetic datasets to data/ (overwrites it).")
+    parser.add_argument("--symbols", type=int, default=4, help="number of ticker symbols")
+    parser.add_argument("--years", type=float, default=25, help="years of daily price history")
+    parser.add_argument("--quarters", type=int, default=40, help="quarters of earnings and statements")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--end-date", default=None, help="last price date, YYYY-MM-DD (default: today)")
+    args = parser.parse_args()
+    write_all(generate(args.symbols, args.years, args.quarters, args.seed, args.end_date))
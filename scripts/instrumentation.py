@@ -0,0 +1,136 @@
+import collections
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+#==================================================
+#              STAGE INSTRUMENTATION
+#==================================================
+
+# Lightweight metrics for pipeline stages. Scripts report what they process
+# with count(), e.g. count("rows_out", len(df)); measure() runs a stage and
+# combines those counters with wall time, CPU time, peak memory and the bytes
+# the process read and wrote. Counters are per process and thread-safe.
+
+_counters = collections.Counter()
+_lock = threading.Lock()
+
+# Counters every report includes, even when a stage never touches them
+STANDARD_COUNTERS = ["rows_in", "rows_out", "api_calls", "api_cache_hits"]
+
+
+def count(name, value=1):
+    """Add `value` to the named counter of the running stage."""
+    with _lock:
+        _counters[name] += value
+
+
+def reset_counters():
+    with _lock:
+        _counters.clear()
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def proc_io():
+    """Bytes read and written by this process so far (Linux /proc/self/io), or None."""
+    try:
+        with open("/proc/self/io", "r") as file:
+            fields = dict(line.split(":") for line in file)
+    except OSError:
+        return None
+    return {"bytes_read": int(fields["rchar"]), "bytes_written": int(fields["wchar"])}
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS mark (Linux), so the next reading covers one stage only."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, from /proc/self/status or getrusage."""
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def measure(function, kwargs=None, profile_path=None, trace_memory=False):
+    """Call `function(**kwargs)`. Returns (its return value, a dict of resource usage and counters).
+
+    With `profile_path` the call runs under cProfile and the stats are dumped
+    there. With `trace_memory` the Python-level allocation peak is recorded
+    via tracemalloc as well (slower). peak_rss_mb covers the process lifetime
+    where the kernel mark cannot be reset (non-Linux).
+    """
+    kwargs = kwargs or {}
+    reset_counters()
+    peak_is_per_stage = reset_peak_rss()
+    io_before = proc_io()
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_path else None
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        if profiler is not None:
+            result = profiler.runcall(function, **kwargs)
+        else:
+            result = function(**kwargs)
+    finally:
+        cpu_s = time.process_time() - cpu_start
+        wall_s = time.perf_counter() - wall_start
+        traced_peak = None
+        if trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        if profiler is not None:
+            profiler.dump_stats(profile_path)
+
+    io_after = proc_io()
+    metrics = {
+        "wall_s": round(wall_s, 3),
+        "cpu_s": round(cpu_s, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1) if peak_rss_mb() is not None else None,
+        "peak_rss_per_stage": peak_is_per_stage,
+        "tracemalloc_peak_mb": round(traced_peak, 1) if traced_peak is not None else None,
+        "bytes_read": io_after["bytes_read"] - io_before["bytes_read"] if io_before else None,
+        "bytes_written": io_after["bytes_written"] - io_before["bytes_written"] if io_before else None,
+    }
+    metrics.update({name: 0 for name in STANDARD_COUNTERS})
+    metrics.update(counters())
+    return result, metrics
+
+
+def profile_summary(profile_path, limit=20):
+    """Top `limit` functions by cumulative time from a cProfile dump, as text."""
+    stream = io.StringIO()
+    pstats.Stats(str(profile_path), stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
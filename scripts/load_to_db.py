@@ -1,5 +1,17 @@
 from pathlib import Path
+from itertools import islice
+from compact_dtypes import CATEGORY_DTYPES, compact_frame
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import count, counters, reset_counters
+from schema import TABLE_DDL, bump_table_version, create_schema, has_primary_key, refresh_trading_days
+from storage import DATA_DIR, dataset_columns, dataset_files, format_of, iter_batches, partition_entries, read_path, stored_layout
+from universe import shard_mask, symbol_shard
+import argparse
+import csv
+import hashlib
+import json
 import sqlite3
+import time
 import pandas as pd
 import gc
 
@@ -19,16 +31,458 @@ if BASE_DIR.name == "scripts":  # Move up one level
 # Manage paths
 DB_PATH = BASE_DIR / "database" / "MarketData.db"
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+MANIFEST_PATH = BASE_DIR / "database" / "load_manifest.json"
+SHARDS_DIR = BASE_DIR / "database" / "shards"
 
-csv_table_pairs = [
-    ("stock_prices.csv", "stock_prices"),
-    ("annual_earnings.csv", "annual_earnings"),
-    ("quarterly_earnings.csv", "quarterly_earnings"),
-    ("income_statements.csv", "income_statements"),
-    ("balance_sheets.csv", "balance_sheets"),
-    ("company_overviews.csv", "company_overviews")
+# Datasets in data/ (any format supported by storage.py) and their tables
+dataset_table_pairs = [
+    ("stock_prices", "stock_prices"),
+    ("annual_earnings", "annual_earnings"),
+    ("quarterly_earnings", "quarterly_earnings"),
+    ("income_statements", "income_statements"),
+    ("balance_sheets", "balance_sheets"),
+    ("company_overviews", "company_overviews")
 ]
 
+# Rows per executemany batch in streaming mode
+CHUNKSIZE = 50_000
+
+# Natural keys (the primary keys in schema.py) used to upsert rows in incremental mode
+NATURAL_KEYS = {
+    "stock_prices": ["symbol", "date"],
+    "annual_earnings": ["symbol", "fiscal_year"],
+    "quarterly_earnings": ["symbol", "fiscal_quarter"],
+    "income_statements": ["symbol", "report_type", "fiscal_date"],
+    "balance_sheets": ["symbol", "report_type", "fiscal_date"],
+    "company_overviews": ["symbol"],
+}
+
+
+#==================================================
+#               CHANGE DETECTION
+#==================================================
+
+def load_manifest():
+    """Return {path relative to data/: {"size", "mtime", "sha256"}} recorded by the last load."""
+    if not MANIFEST_PATH.exists():
+        return {}
+    with open(MANIFEST_PATH, "r") as file:
+        return json.load(file)
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def manifest_key(path):
+    """Key of a data file in the load manifest: its file name, or data/-relative path for a partition."""
+    return path.relative_to(DATA_DIR).as_posix()
+
+
+def file_sha256(path, size=None):
+    """Hash a whole file, or only its first `size` bytes."""
+    digest = hashlib.sha256()
+    remaining = path.stat().st_size if size is None else size
+    with open(path, "rb") as file:
+        while remaining > 0:
+            chunk = file.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def file_entry(path, sha256=None):
+    stat = path.stat()
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": sha256 or file_sha256(path),
+    }
+
+
+def detect_change(path, previous):
+    """Classify a data file against its manifest entry.
+
+    Returns ("unchanged" | "appended" | "changed", new manifest entry). A file
+    counts as appended when its old content is an exact prefix of the new one,
+    which is how incremental price refreshes write, so only the tail is read.
+    """
+    stat = path.stat()
+    if previous and stat.st_size == previous["size"] and stat.st_mtime == previous["mtime"]:
+        return "unchanged", previous
+
+    entry = file_entry(path)
+    if not previous:
+        return "changed", entry
+    if entry["sha256"] == previous["sha256"]:
+        return "unchanged", entry
+    if (format_of(path) == "csv" and stat.st_size > previous["size"]
+            and file_sha256(path, previous["size"]) == previous["sha256"]):
+        return "appended", entry
+    return "changed", entry
+
+
+def read_appended_rows(path, offset):
+    """Read the CSV rows written after byte `offset`, using the header of the file."""
+    header = pd.read_csv(path, nrows=0).columns
+    with open(path, "rb") as file:
+        file.seek(offset)
+        df = pd.read_csv(file, header=None, names=header)
+    count("rows_in", len(df))
+    return df
+
+
+#==================================================
+#                 UPSERT ROWS
+#==================================================
+
+def table_exists(conn, table_name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+    return row is not None
+
+
+def insert_sql(table_name, columns, upsert=True):
+    """INSERT statement for `columns`, updating existing rows on the natural key if `upsert`."""
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})"
+    if not upsert:
+        return sql
+
+    keys = NATURAL_KEYS[table_name]
+    updates = [column for column in columns if column not in keys]
+    if updates:
+        conflict_action = "DO UPDATE SET " + ", ".join(f'"{column}" = excluded."{column}"' for column in updates)
+    else:
+        conflict_action = "DO NOTHING"
+    return f"{sql} ON CONFLICT ({', '.join(keys)}) {conflict_action}"
+
+
+def dataframe_rows(df):
+    """Row tuples with missing values as None, ready for executemany."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def upsert_dataframe(conn, table_name, df):
+    """Insert or update rows on the table's natural key with INSERT ... ON CONFLICT."""
+    conn.executemany(insert_sql(table_name, list(df.columns)), dataframe_rows(df))
+    count("rows_out", len(df))
+    return len(df)
+
+
+def load_columns(conn, table_name, path):
+    """Columns of the data file that the table stores, so nothing else is decoded."""
+    table_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    return [column for column in dataset_columns(path) if column in table_columns]
+
+
+def read_table_frame(conn, table_name, paths):
+    """Read the columns a table stores from its data files, with categorical symbols and integer volume.
+
+    Dates and prices keep their stored representation, since they are written
+    to the database as they are (see compact_dtypes.py).
+    """
+    frames = [read_path(path, columns=load_columns(conn, table_name, path), dtype=CATEGORY_DTYPES) for path in paths]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return compact_frame(df, dates=False, prices=False)
+
+
+def describe_files(paths):
+    """File name of a single-file dataset, or the number of partitions."""
+    return paths[0].name if len(paths) == 1 else f"{len(paths)} partitions"
+
+
+#==================================================
+#              STREAMING BULK LOAD
+#==================================================
+
+# Settings for bulk loading. A freshly rebuilt database is simply rebuilt again
+# after a crash, so it skips the rollback journal; incremental loads keep WAL.
+BULK_PRAGMAS = [
+    "PRAGMA cache_size = -65536",  # 64 MB page cache
+    "PRAGMA temp_store = MEMORY",
+]
+REBUILD_PRAGMAS = ["PRAGMA journal_mode = OFF", "PRAGMA synchronous = OFF"]
+INCREMENTAL_PRAGMAS = ["PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL"]
+
+
+def apply_pragmas(conn, pragmas):
+    for pragma in pragmas:
+        conn.execute(pragma)
+
+
+def read_csv_header(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        return next(csv.reader(file))
+
+
+def iter_csv_chunks(csv_path, chunksize, offset=None):
+    """Yield lists of at most `chunksize` row tuples, after the header or from byte `offset`.
+
+    Values stay text: the typed columns in schema.py convert them on insert
+    through SQLite's type affinity. Empty fields become NULL.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        if offset is None:
+            file.readline()
+        else:
+            file.seek(offset)
+        reader = csv.reader(file)
+        while True:
+            chunk = [tuple(value if value != "" else None for value in row) for row in islice(reader, chunksize)]
+            if not chunk:
+                return
+            yield chunk
+
+
+def stream_table(conn, path, table_name, upsert, chunksize=CHUNKSIZE, offset=None, verbose=True):
+    """Stream a data file into a table in fixed-size batches within a single transaction.
+
+    Memory use is bounded by `chunksize` rather than the file size. Columnar
+    files are read batch by batch, decoding only the columns the table stores.
+    """
+    if format_of(path) == "csv":
+        columns = read_csv_header(path)
+        chunks = iter_csv_chunks(path, chunksize, offset)
+    else:
+        columns = load_columns(conn, table_name, path)
+        chunks = (dataframe_rows(batch) for batch in iter_batches(path, chunksize, columns))
+
+    sql = insert_sql(table_name, columns, upsert=upsert)
+    start = time.perf_counter()
+    n_rows = 0
+    for chunk in chunks:
+        chunk = list(chunk)
+        conn.executemany(sql, chunk)
+        n_rows += len(chunk)
+    conn.commit()
+    count("rows_in", n_rows)
+    count("rows_out", n_rows)
+    if verbose:
+        report_rate(table_name, n_rows, time.perf_counter() - start)
+    return n_rows
+
+
+def stream_files(conn, paths, table_name, upsert, chunksize=CHUNKSIZE):
+    """Stream several data files (e.g. partitions) into a table, reporting the combined rate."""
+    start = time.perf_counter()
+    n_rows = sum(stream_table(conn, path, table_name, upsert, chunksize, verbose=False) for path in paths)
+    report_rate(table_name, n_rows, time.perf_counter() - start)
+    return n_rows
+
+
+def report_rate(table_name, n_rows, elapsed):
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Streamed {n_rows} rows into {table_name} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+
+#==================================================
+#                  LOAD MODES
+#==================================================
+
+def load_shard(shard, shards):
+    """Load the rows of one shard of symbols into its own database file, in a worker process.
+
+    Returns (path of the shard database, the worker's instrumentation counters).
+    """
+    reset_counters()
+    SHARDS_DIR.mkdir(parents=True, exist_ok=True)
+    path = SHARDS_DIR / f"shard_{shard}.db"
+    path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(path)
+    try:
+        apply_pragmas(conn, BULK_PRAGMAS + REBUILD_PRAGMAS)
+        for ddl in TABLE_DDL.values():
+            conn.execute(ddl)
+        for dataset, table_name in dataset_table_pairs:
+            if stored_layout(dataset) == "partitioned":
+                # Read only the partitions of this shard's symbols
+                paths = [path for path, entry in partition_entries(dataset).items()
+                         if symbol_shard(entry["symbol"], shards) == shard]
+                df = read_table_frame(conn, table_name, paths) if paths else None
+            else:
+                paths = dataset_files(dataset)
+                df = read_table_frame(conn, table_name, paths) if paths else None
+                if df is not None:
+                    df = df[shard_mask(df["symbol"], shard, shards)]
+            if df is not None:
+                df.to_sql(table_name, conn, if_exists="append", index=False)
+                count("rows_out", len(df))
+        conn.commit()
+    finally:
+        conn.close()
+    return str(path), counters()
+
+
+def load_shards(shards):
+    """Build one shard database per worker process. Returns their paths in shard order."""
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        outcomes = list(pool.map(load_shard, range(shards), [shards] * shards))
+    for _, worker_counters in outcomes:
+        for name, value in worker_counters.items():
+            count(name, value)
+    return [path for path, _ in outcomes]
+
+
+def insert_from_shards(conn, table_name, shard_paths):
+    """Copy a table from every shard database into the main database.
+
+    Tables are keyed on their natural keys, so the result does not depend on
+    how rows were split across shards.
+    """
+    for path in shard_paths:
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        conn.execute(f"INSERT INTO main.{table_name} SELECT * FROM shard.{table_name}")
+        conn.commit()
+        conn.execute("DETACH DATABASE shard")
+
+
+def rebuild_database(stream=False, chunksize=CHUNKSIZE, shards=1):
+    """Delete the database and load every dataset from scratch.
+
+    With `shards` above 1, symbols are split into that many shards, each
+    read and written to a shard database by its own worker process, and the
+    shards are then merged with INSERT ... SELECT. Shard workers read their
+    rows whole, so `shards` cannot be combined with `stream`.
+    """
+    if stream and shards > 1:
+        raise ValueError("Streaming loads cannot be sharded: use either stream or shards")
+    # Safely delete the database file if it exists
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+
+    manifest = {}
+    shard_paths = load_shards(shards) if shards > 1 else None
+
+    # Create and populate new SQLite database
+    with sqlite3.connect(DB_PATH) as conn:
+        if stream:
+            apply_pragmas(conn, BULK_PRAGMAS + REBUILD_PRAGMAS)
+        create_schema(conn)
+        for dataset, table_name in dataset_table_pairs:
+            paths = dataset_files(dataset)
+            if paths:
+                if shard_paths:
+                    insert_from_shards(conn, table_name, shard_paths)
+                elif stream:
+                    stream_files(conn, paths, table_name, upsert=False, chunksize=chunksize)
+                else:
+                    df = read_table_frame(conn, table_name, paths)
+                    df.to_sql(table_name, conn, if_exists="append", index=False)
+                    count("rows_out", len(df))
+                bump_table_version(conn, table_name)
+                for path in paths:
+                    manifest[manifest_key(path)] = file_entry(path)
+                print(f"Loaded {table_name} from {describe_files(paths)}")
+            else:
+                print(f"File not found: {BASE_DIR / 'data' / dataset}")
+
+        # Number the trading days used for event offsets in the queries
+        refresh_trading_days(conn, all_symbols=True)
+
+        # Refresh planner statistics for the new indexes
+        conn.execute("ANALYZE")
+
+        # WAL lets the read-only query connections run concurrently with later
+        # loads. The journal mode cannot change inside a transaction, so commit first.
+        conn.commit()
+        conn.execute("PRAGMA journal_mode = WAL")
+
+    if shard_paths:
+        for path in shard_paths:
+            Path(path).unlink()
+        SHARDS_DIR.rmdir()
+    save_manifest(manifest)
+
+
+def upsert_file(conn, path, table_name, status, previous, stream=False, chunksize=CHUNKSIZE):
+    """Upsert the rows of a changed data file, or only the appended tail. Returns the number of rows."""
+    offset = previous["size"] if status == "appended" else None
+    if stream:
+        return stream_table(conn, path, table_name, upsert=True, chunksize=chunksize, offset=offset)
+    if offset:
+        return upsert_dataframe(conn, table_name, read_appended_rows(path, offset))
+    return upsert_dataframe(conn, table_name, read_table_frame(conn, table_name, [path]))
+
+
+def load_incremental(stream=False, chunksize=CHUNKSIZE):
+    """Upsert only the data files (or appended tails of CSVs) that changed since the last load.
+
+    Partitioned datasets are checked partition by partition, so only the
+    partitions a refresh rewrote are read.
+    """
+    if not DB_PATH.exists():
+        print("No existing database found. Running a full load instead.")
+        rebuild_database(stream, chunksize)
+        return
+
+    with sqlite3.connect(DB_PATH) as conn:
+        legacy_tables = [table for _, table in dataset_table_pairs
+                         if table_exists(conn, table) and not has_primary_key(conn, table)]
+    if legacy_tables:
+        print("Existing database predates the typed schema. Running a full load instead.")
+        rebuild_database(stream, chunksize)
+        return
+
+    manifest = load_manifest()
+
+    with sqlite3.connect(DB_PATH) as conn:
+        if stream:
+            apply_pragmas(conn, BULK_PRAGMAS + INCREMENTAL_PRAGMAS)
+        create_schema(conn)
+        for dataset, table_name in dataset_table_pairs:
+            paths = dataset_files(dataset)
+            if not paths:
+                print(f"File not found: {BASE_DIR / 'data' / dataset}")
+                continue
+
+            table_empty = conn.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is None
+            n_rows, changed = 0, []
+            for path in paths:
+                key = manifest_key(path)
+                previous = None if table_empty else manifest.get(key)
+                status, entry = detect_change(path, previous)
+                if status != "unchanged":
+                    n_rows += upsert_file(conn, path, table_name, status, previous, stream, chunksize)
+                    changed.append(f"{key} ({status})")
+                manifest[key] = entry
+
+            if not changed:
+                print(f"Skipped {table_name}: {describe_files(paths)} unchanged")
+                continue
+            bump_table_version(conn, table_name)
+            if len(paths) == 1:
+                print(f"Upserted {n_rows} rows into {table_name} from {paths[0].name} ({status})")
+            else:
+                print(f"Upserted {n_rows} rows into {table_name} from {len(changed)} of {len(paths)} partitions")
+
+        # Renumber trading days only for symbols that received new prices
+        n_symbols = refresh_trading_days(conn)
+        if n_symbols:
+            bump_table_version(conn, "stock_prices")
+            print(f"Renumbered trading days for {n_symbols} symbol(s)")
+
+        # Re-analyze only the tables whose statistics are out of date
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+        conn.execute("PRAGMA journal_mode = WAL")
+
+    save_manifest(manifest)
+
+
+def main(incremental=False, stream=False, chunksize=CHUNKSIZE, shards=1):
+    if incremental and shards > 1:
+        raise ValueError("Incremental loads cannot be sharded: use either incremental or shards")
+    if incremental:
+        load_incremental(stream=stream, chunksize=chunksize)
+    else:
+        rebuild_database(stream=stream, chunksize=chunksize, shards=shards)
+
+
 # === Clean up potential lingering connections ===
 # Only needed if running in an interactive environment like Spyder
 try:
@@ -43,17 +497,20 @@ except NameError:
 
 gc.collect()  # Force garbage collection to help free file locks
 
-# Safely delete the database file if it exists
-if DB_PATH.exists():
-    DB_PATH.unlink()
-
-# Create and populate new SQLite database
-with sqlite3.connect(DB_PATH) as conn:
-    for filename, table_name in csv_table_pairs:
-        csv_path = BASE_DIR / "data" / filename
-        if csv_path.exists():
-            df = pd.read_csv(csv_path)
-            df.to_sql(table_name, conn, if_exists="replace", index=False)
-            print(f"Loaded {table_name} from {filename}")
-        else:
-            print(f"File not found: {csv_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the datasets in data/ into the SQLite database.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="keep the existing database and upsert only rows from changed data files")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream data files in fixed-size batches instead of reading them whole into memory")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE,
+                        help=f"rows per batch in streaming mode (default: {CHUNKSIZE})")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="full loads only: split symbols into this many shards loaded by parallel workers")
+    args = parser.parse_args()
+    if args.stream and args.shards > 1:
+        parser.error("--stream cannot be combined with --shards: shard workers read their rows whole")
+    if args.incremental and args.shards > 1:
+        parser.error("--incremental cannot be combined with --shards: only full loads are sharded")
+    main(incremental=args.incremental, stream=args.stream, chunksize=args.chunksize, shards=args.shards)
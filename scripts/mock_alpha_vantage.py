@@ -0,0 +1,244 @@
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from generate_synthetic_data import generate
+import argparse
+import collections
+import json
+import random
+import signal
+import threading
+import time
+import zlib
+
+#==================================================
+#           LOCAL MOCK ALPHA VANTAGE API
+#==================================================
+
+# Stand-in for https://www.alphavantage.co/query that serves synthetic
+# TIME_SERIES_DAILY, EARNINGS, INCOME_STATEMENT, BALANCE_SHEET and OVERVIEW
+# payloads for any symbol, with configurable latency, rate limiting and
+# failures. Point the fetchers at it to measure throughput offline:
+#
+#   python scripts/mock_alpha_vantage.py --port 8765 --rate-limit 0
+#   ALPHA_VANTAGE_API_KEY=demo ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:8765/query \
+#   ALPHA_VANTAGE_REQUESTS_PER_MINUTE=0 python scripts/fetch_all.py --no-cache
+
+RATE_LIMIT_NOTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute "
+                   "and 500 calls per day. (Simulated by mock_alpha_vantage.py)")
+
+# outputsize=compact returns the latest 100 trading days
+COMPACT_DAYS = 100
+
+
+#==================================================
+#                    PAYLOADS
+#==================================================
+
+@lru_cache(maxsize=256)
+def symbol_datasets(symbol, years, quarters):
+    """Synthetic datasets for one symbol, seeded by its name so every request sees the same data."""
+    return generate(years=years, quarters=quarters, seed=zlib.crc32(symbol.encode("utf-8")), symbols=[symbol])
+
+
+def as_strings(record, skip=()):
+    # Alpha Vantage returns every value as a string
+    return {key: str(value) for key, value in record.items() if key not in skip}
+
+
+def time_series_daily(symbol, datasets, outputsize):
+    prices = datasets["stock_prices"].iloc[::-1]  # Newest first, like the API
+    if outputsize != "full":
+        prices = prices.head(COMPACT_DAYS)
+    series = {
+        row.date: {
+            "1. open": f"{row.open:.4f}",
+            "2. high": f"{row.high:.4f}",
+            "3. low": f"{row.low:.4f}",
+            "4. close": f"{row.close:.4f}",
+            "5. volume": str(int(row.volume)),
+        }
+        for row in prices.itertuples(index=False)
+    }
+    return {
+        "Meta Data": {
+            "1. Information": "Daily Prices (open, high, low, close) and Volumes",
+            "2. Symbol": symbol,
+            "3. Last Refreshed": prices["date"].iloc[0],
+            "4. Output Size": "Full size" if outputsize == "full" else "Compact",
+            "5. Time Zone": "US/Eastern",
+        },
+        "Time Series (Daily)": series,
+    }
+
+
+def earnings(symbol, datasets):
+    annual = datasets["annual_earnings"].iloc[::-1]
+    quarterly = datasets["quarterly_earnings"].iloc[::-1]
+    return {
+        "symbol": symbol,
+        "annualEarnings": [
+            {"fiscalDateEnding": row.fiscal_year, "reportedEPS": str(row.reported_EPS)}
+            for row in annual.itertuples(index=False)
+        ],
+        "quarterlyEarnings": [
+            {
+                "fiscalDateEnding": row.fiscal_quarter,
+                "reportedDate": row.reported_date,
+                "reportedEPS": str(row.reported_EPS),
+                "estimatedEPS": str(row.estimated_EPS),
+                "surprise": str(row.surprise),
+                "surprisePercentage": str(row.surprise_pct),
+                "reportTime": row.report_time,
+            }
+            for row in quarterly.itertuples(index=False)
+        ],
+    }
+
+
+def statements(symbol, df):
+    reports = {}
+    for report_type, key in [("annual", "annualReports"), ("quarterly", "quarterlyReports")]:
+        rows = df[df["report_type"] == report_type].iloc[::-1]
+        reports[key] = [
+            {"fiscalDateEnding": record["fiscal_date"], "reportedCurrency": record["reported_currency"],
+             **as_strings(record, skip=("symbol", "report_type", "fiscal_date", "reported_currency"))}
+            for record in rows.to_dict("records")
+        ]
+    return {"symbol": symbol, **reports}
+
+
+def overview(symbol, datasets):
+    record = datasets["company_overviews"].to_dict("records")[0]
+    return {"Symbol": symbol, **as_strings(record, skip=("symbol",))}
+
+
+def payload(function, symbol, params, years, quarters):
+    """JSON body the real API would return for a successful request."""
+    datasets = symbol_datasets(symbol, years, quarters)
+    if function == "TIME_SERIES_DAILY":
+        return time_series_daily(symbol, datasets, params.get("outputsize", "compact"))
+    if function == "EARNINGS":
+        return earnings(symbol, datasets)
+    if function == "INCOME_STATEMENT":
+        return statements(symbol, datasets["income_statements"])
+    if function == "BALANCE_SHEET":
+        return statements(symbol, datasets["balance_sheets"])
+    if function == "OVERVIEW":
+        return overview(symbol, datasets)
+    return {"Error Message": f"Invalid API call. Unknown function '{function}'."}
+
+
+#==================================================
+#                     SERVER
+#==================================================
+
+class MockSettings:
+    """Behaviour of the mock server, shared by all request handler threads."""
+
+    def __init__(self, latency=0.05, jitter=0.02, rate_limit=5, note_rate=0.0, failure_rate=0.0,
+                 years=25, quarters=40, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.note_rate = note_rate
+        self.failure_rate = failure_rate
+        self.years = years
+        self.quarters = quarters
+        self.random = random.Random(seed)
+        self.recent = collections.deque()  # Request times within the last minute
+        self.stats = collections.Counter()
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Return (delay, outcome) for a new request, where outcome is "ok", "note" or "fail"."""
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            self.recent.append(now)
+            over_limit = self.rate_limit and len(self.recent) > self.rate_limit
+
+            delay = max(0.0, self.random.gauss(self.latency, self.jitter))
+            if over_limit or self.random.random() < self.note_rate:
+                outcome = "note"
+            elif self.random.random() < self.failure_rate:
+                outcome = "fail"
+            else:
+                outcome = "ok"
+            self.stats[outcome] += 1
+            return delay, outcome
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+    def do_GET(self):
+        settings = self.server.settings
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        delay, outcome = settings.draw()
+        time.sleep(delay)
+
+        if url.path != "/query":
+            return self.send_json({"Error Message": "Not found"}, status=404)
+        if outcome == "fail":
+            return self.send_json({"Error Message": "Simulated server error"}, status=503)
+        if outcome == "note":
+            return self.send_json({"Note": RATE_LIMIT_NOTE})
+        if not params.get("apikey"):
+            return self.send_json({"Error Message": "the parameter apikey is invalid or missing."})
+        if not params.get("symbol"):
+            return self.send_json({"Error Message": "Invalid API call. The symbol parameter is required."})
+
+        symbol = params["symbol"].upper()
+        self.send_json(payload(params.get("function"), symbol, params, settings.years, settings.quarters))
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Per-request logging would dominate throughput measurements
+
+
+def make_server(host="127.0.0.1", port=8765, settings=None):
+    """Create (but do not start) a threaded mock server. Use port 0 for any free port."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.settings = settings or MockSettings()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic Alpha Vantage responses for offline fetch tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="standard deviation of the delay in seconds")
+    parser.add_argument("--rate-limit", type=int, default=5,
+                        help="requests per rolling minute before 'Note' replies (0 = unlimited)")
+    parser.add_argument("--note-rate", type=float, default=0.0, help="probability of a random 'Note' reply")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability of an HTTP 503 reply")
+    parser.add_argument("--years", type=float, default=25, help="years of daily price history per symbol")
+    parser.add_argument("--quarters", type=int, default=40, help="quarters of earnings and statements per symbol")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency and failure draws")
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.jitter, args.rate_limit, args.note_rate, args.failure_rate,
+                            args.years, args.quarters, args.seed)
+    server = make_server(args.host, args.port, settings)
+    print(f"Mock Alpha Vantage API on http://{args.host}:{server.server_port}/query (Ctrl+C to stop)", flush=True)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Also print the stats when terminated
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {sum(settings.stats.values())} requests: {dict(settings.stats)}")
@@ -0,0 +1,49 @@
+from pathlib import Path
+import pandas as pd
+
+#==================================================
+#                 QUERY RESULTS
+#==================================================
+
+# Query results are handed to the visualizations as DataFrames with date
+# columns already parsed. The CSV files in results/ are an optional side
+# output, read back with the same dtypes when a figure is drawn on its own.
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+RESULTS_DIR = BASE_DIR / "results"
+
+# Date columns per result; "month" columns hold YYYY-MM strings
+DATE_COLUMNS = {
+    "earnings_surprise_vs_price_reaction": ["fiscal_quarter", "reported_date"],
+    "monthly_net_2pct_gain_counts": ["month"],
+    "post_earnings_drift": ["fiscal_quarter", "reported_date"],
+    "profitability_ratios_annual": ["fiscal_date"],
+    "stock_volatility_last_6_months": ["month"],
+    "valuation_multiples": ["price_date"],
+}
+
+
+def result_path(name):
+    return RESULTS_DIR / f"{name}.csv"
+
+
+def typed_result(name, df):
+    """Return `df` with the result's date columns parsed to datetime64."""
+    df = df.copy()
+    for column in DATE_COLUMNS.get(name, []):
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def read_result(name):
+    """Read a saved result from results/ with parsed date columns."""
+    return typed_result(name, pd.read_csv(result_path(name)))
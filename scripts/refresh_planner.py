@@ -0,0 +1,241 @@
+from pathlib import Path
+from datetime import date, datetime, timedelta
+from av_client import REQUESTS_PER_DAY, REQUESTS_PER_DAY_ENV, QuotaLedger, build_client, env_int, load_api_key
+from fetch_all import FETCHERS, PARSERS, finish_run, run_checkpoint
+from fetch_checkpoint import fetch_resumable, parse_results
+from response_cache import ResponseCache
+from universe import load_universe
+import argparse
+import json
+import numpy as np
+import pandas as pd
+import fetch_stock_prices
+import storage
+
+
+#==================================================
+#             QUOTA-AWARE REFRESH PLAN
+#==================================================
+
+# Decides which API calls are worth making today. Every (endpoint, symbol)
+# call gets a staleness: the number of days since data it would add became
+# available. Prices are stale from the first trading day after the last stored
+# date. Earnings are only due once the next quarterly report is expected (91
+# days after the latest reported_date in quarterly_earnings), and income
+# statements, balance sheets and overviews only when the company has reported
+# a quarter they do not cover yet, so symbols that have not reported cost no
+# calls. A statement that was fetched after the report but did not include the
+# new quarter yet is checked again only a week later. The staleness of stored
+# statements and overviews is capped at a month, so stale prices are planned
+# first. Due calls are ranked by staleness and planned up to the requests left
+# in today's budget (see the quota ledger in av_client.py).
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+# Days between quarterly reports
+REPORT_INTERVAL = timedelta(days=91)
+
+# Staleness of data that is not stored at all, so it is planned first
+MISSING_STALENESS = 10_000
+
+# Highest staleness of a stored statement or overview, below prices a month stale
+FUNDAMENTALS_STALENESS_CAP = 30
+
+# Days before a statement that did not cover the reported quarter is checked again
+STATEMENT_RECHECK = timedelta(days=7)
+
+STATEMENT_DATASETS = {
+    "INCOME_STATEMENT": "income_statements",
+    "BALANCE_SHEET": "balance_sheets",
+}
+
+
+def as_date(value):
+    """date of an ISO date string (or datetime), or None."""
+    if value is None or pd.isna(value):
+        return None
+    return date.fromisoformat(str(value)[:10])
+
+
+def report_dates():
+    """({symbol: latest reported_date}, {symbol: latest fiscal_quarter}) from quarterly_earnings."""
+    earnings = storage.read_dataset("quarterly_earnings", columns=["symbol", "fiscal_quarter", "reported_date"])
+    if earnings is None or earnings.empty:
+        return {}, {}
+    latest = earnings.astype({"symbol": str}).groupby("symbol")[["fiscal_quarter", "reported_date"]].max()
+    return ({symbol: as_date(value) for symbol, value in latest["reported_date"].items()},
+            {symbol: as_date(value) for symbol, value in latest["fiscal_quarter"].items()})
+
+
+def last_fetched(cache, function, symbol):
+    """date of the last cached response of a parameterless call, or None."""
+    entry = cache.load(function, symbol, {})
+    return datetime.fromisoformat(entry["fetched_at"]).date() if entry else None
+
+
+def price_call(latest, today):
+    """(staleness, reason) of the TIME_SERIES_DAILY call; staleness None if it can be skipped."""
+    if latest is None:
+        return MISSING_STALENESS, "no prices stored"
+    first_missing = as_date(np.busday_offset(np.datetime64(latest, "D"), 1, roll="forward"))
+    if first_missing >= today:
+        return None, f"prices up to {latest}"
+    return (today - first_missing).days, f"prices missing since {first_missing}"
+
+
+def earnings_call(latest_report, fetched, today):
+    if latest_report is None:
+        return MISSING_STALENESS, "no earnings stored"
+    next_report = latest_report + REPORT_INTERVAL
+    if next_report > today:
+        return None, f"next report expected around {next_report}"
+    if fetched is not None and fetched >= today:
+        return None, "already checked today"
+    return (today - next_report).days, f"report expected since {next_report}"
+
+
+def statement_call(stored, latest_quarter, latest_report, fetched, today):
+    if stored is None:
+        return MISSING_STALENESS, "no statements stored"
+    if latest_quarter is None or latest_quarter <= stored:
+        return None, f"no report since fiscal date {stored}"
+    reported = latest_report or latest_quarter
+    if fetched is not None and fetched >= reported and today < fetched + STATEMENT_RECHECK:
+        return None, f"quarter {latest_quarter} not published on {fetched}"
+    staleness = min((today - reported).days, FUNDAMENTALS_STALENESS_CAP)
+    return staleness, f"quarter {latest_quarter} reported on {reported}"
+
+
+def overview_call(stored, latest_report, fetched, today):
+    if not stored:
+        return MISSING_STALENESS, "no overview stored"
+    if latest_report is None or (fetched is not None and fetched >= latest_report):
+        return None, "no report since the last fetch"
+    return min((today - latest_report).days, FUNDAMENTALS_STALENESS_CAP), f"reported on {latest_report}"
+
+
+def candidate_calls(symbols=None, today=None, cache=None):
+    """Every (endpoint, symbol) call with its staleness in days (None if it can be skipped) and the reason."""
+    symbols = symbols if symbols is not None else load_universe()
+    today = today or date.today()
+    cache = cache or ResponseCache()
+    latest_reports, latest_quarters = report_dates()
+    latest_prices = storage.latest_dates("stock_prices")
+    latest_statements = {function: storage.latest_dates(name) for function, name in STATEMENT_DATASETS.items()}
+    overviews = storage.read_dataset("company_overviews", columns=["symbol"])
+    overview_symbols = set() if overviews is None else set(overviews["symbol"].astype(str))
+
+    calls = []
+    for symbol in symbols:
+        latest_report = latest_reports.get(symbol)
+        latest_price = latest_prices.get(symbol)
+        params = {"outputsize": fetch_stock_prices.output_size(latest_price, today)}
+        calls.append(("TIME_SERIES_DAILY", symbol, params, *price_call(latest_price, today)))
+        calls.append(("EARNINGS", symbol, {},
+                      *earnings_call(latest_report, last_fetched(cache, "EARNINGS", symbol), today)))
+        for function in STATEMENT_DATASETS:
+            stored = as_date(latest_statements[function].get(symbol))
+            calls.append((function, symbol, {},
+                          *statement_call(stored, latest_quarters.get(symbol), latest_report,
+                                          last_fetched(cache, function, symbol), today)))
+        calls.append(("OVERVIEW", symbol, {},
+                      *overview_call(symbol in overview_symbols, latest_report,
+                                     last_fetched(cache, "OVERVIEW", symbol), today)))
+    calls = pd.DataFrame(calls, columns=["function", "symbol", "params", "staleness_days", "reason"])
+    return calls.astype({"staleness_days": "Int64"})
+
+
+def remaining_budget(today=None):
+    """Requests left today on the API key --run fetches with (the first one), according to its quota ledger."""
+    today = today or date.today()
+    limit = env_int(REQUESTS_PER_DAY_ENV, REQUESTS_PER_DAY)
+    ledger = QuotaLedger(BASE_DIR / "cache" / "quota", load_api_key(BASE_DIR))
+    return max(limit - ledger.used(today), 0)
+
+
+def plan_refresh(budget=None, symbols=None, today=None):
+    """Rank the due calls by staleness and plan as many as `budget` (default: today's remaining requests) allows.
+
+    Returns every candidate call with a "planned" column; skipped calls have
+    no staleness.
+    """
+    budget = remaining_budget(today) if budget is None else budget
+    calls = candidate_calls(symbols, today)
+    calls = calls.sort_values("staleness_days", ascending=False, na_position="last", kind="stable",
+                              ignore_index=True)
+    due = calls["staleness_days"].notna()
+    calls["planned"] = due & (due.cumsum() <= budget)
+    return calls
+
+
+def plan_jobs(plan):
+    """`(function, symbol, params)` jobs of the planned calls, in priority order."""
+    planned = plan[plan["planned"]]
+    return list(zip(planned["function"], planned["symbol"], planned["params"]))
+
+
+def run_plan(client, jobs):
+    """Fetch the planned jobs and write only the symbols they cover. Returns {module name: saved}.
+
+    Prices are appended as in an incremental fetch; other datasets replace
+    the rows of the fetched symbols (storage.replace_symbols()). Only the
+    checkpoints of the planned endpoints are cleared, so those of another
+    unfinished run are kept.
+    """
+    checkpoint = run_checkpoint(client.replay)
+    results = fetch_resumable(client, jobs, PARSERS, checkpoint)
+    saved = {}
+    for fetcher in FETCHERS:
+        family = [result for result in results if result[0][0] == fetcher.FUNCTION]
+        if not family:
+            continue
+        frames = parse_results(fetcher, family)
+        if frames is not None:
+            if fetcher is fetch_stock_prices:
+                fetcher.save_frames(frames, incremental=True)
+            else:
+                for name, df in frames.items():
+                    storage.replace_symbols(df, name)
+        saved[fetcher.__name__] = frames is not None
+    finish_run(checkpoint, saved, functions={function for function, _, _ in jobs})
+    return saved
+
+
+def print_plan(plan, budget):
+    due = plan["staleness_days"].notna()
+    print(plan.drop(columns="params").to_string(index=False))
+    print(f"\nPlanned {plan['planned'].sum()} of {due.sum()} due calls within a budget of {budget} "
+          f"({(~due).sum()} calls skipped as up to date)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan today's API calls by staleness within the daily quota.")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="calls to plan (default: the requests left today in the quota ledger)")
+    parser.add_argument("--output", default=None, help="also save the planned jobs as JSON to this path")
+    parser.add_argument("--run", action="store_true", help="fetch the planned calls and save their data")
+    args = parser.parse_args()
+
+    budget = remaining_budget() if args.budget is None else args.budget
+    plan = plan_refresh(budget)
+    print_plan(plan, budget)
+    jobs = plan_jobs(plan)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump([{"function": function, "symbol": symbol, "params": params}
+                       for function, symbol, params in jobs], file, indent=2)
+        print(f"Plan saved to {args.output}")
+    if args.run and jobs:
+        client = build_client(BASE_DIR)
+        if client is None:
+            print("No valid API key found. Nothing was fetched.")
+        else:
+            with client:
+                run_plan(client, jobs)
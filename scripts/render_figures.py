@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import importlib
+import os
+import time
+
+#==================================================
+#          RENDER ALL FIGURES IN PARALLEL
+#==================================================
+
+# Batch mode for the visualize_* scripts: each figure is rendered headless
+# (Agg backend, no show()) in its own worker process, so the whole stage
+# takes about as long as the slowest single plot.
+
+# {visualize script: query result it plots}
+VISUALIZATIONS = {
+    "visualize_earnings_surprise_vs_price": "earnings_surprise_vs_price_reaction",
+    "visualize_monthly_net_2pct_gain_counts": "monthly_net_2pct_gain_counts",
+    "visualize_post_earnings_drift": "post_earnings_drift",
+    "visualize_profitability_ratios_annual": "profitability_ratios_annual",
+    "visualize_stock_volatility_last_6_months": "stock_volatility_last_6_months",
+    "visualize_valuation_multiples": "valuation_multiples",
+}
+
+
+def init_worker():
+    from figure_output import use_headless_backend
+    use_headless_backend()
+
+
+def render_one(name, formats, dpi):
+    """Render one visualization headless. Returns the elapsed seconds."""
+    start = time.perf_counter()
+    importlib.import_module(name).main(formats=formats, dpi=dpi, show=False)
+    return time.perf_counter() - start
+
+
+def render_all(formats=("png",), dpi=300, workers=None, names=list(VISUALIZATIONS)):
+    """Render every figure in a process pool. Returns {name: seconds, or the exception raised}."""
+    workers = workers or min(len(names), os.cpu_count() or 1)
+    start = time.perf_counter()
+    outcomes = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = {name: pool.submit(render_one, name, formats, dpi) for name in names}
+        for name, future in futures.items():
+            try:
+                outcomes[name] = future.result()
+                print(f"Rendered {name} in {outcomes[name]:.2f}s")
+            except Exception as e:
+                outcomes[name] = e
+                print(f"Failed to render {name}: {e}")
+    print(f"Rendered {len(names)} figures as {', '.join(formats)} at {dpi} dpi "
+          f"in {time.perf_counter() - start:.2f}s using {workers} worker(s)")
+    return outcomes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render all figures headless and in parallel.")
+    parser.add_argument("--formats", nargs="+", default=["png"], help="output formats, e.g. png svg pdf")
+    parser.add_argument("--dpi", type=int, default=300, help="resolution (default: 300)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per figure, up to the CPU count)")
+    args = parser.parse_args()
+    outcomes = render_all(formats=args.formats, dpi=args.dpi, workers=args.workers)
+    raise SystemExit(1 if any(isinstance(outcome, Exception) for outcome in outcomes.values()) else 0)
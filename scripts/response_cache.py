@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import hashlib
+import gzip
+import json
+import os
+
+
+#==================================================
+#            RAW API RESPONSE CACHE
+#==================================================
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+CACHE_DIR = BASE_DIR / "cache" / "responses"
+
+# How long a cached response is served before the API is called again
+TTL_BY_FUNCTION = {
+    "TIME_SERIES_DAILY": timedelta(hours=12),
+    "OVERVIEW": timedelta(days=1),
+    "EARNINGS": timedelta(days=1),
+    "INCOME_STATEMENT": timedelta(days=90),
+    "BALANCE_SHEET": timedelta(days=90),
+}
+DEFAULT_TTL = timedelta(days=1)
+
+# Fundamentals only change when a company reports, so they are also
+# invalidated as soon as the cached earnings show a newer report date
+FUNDAMENTAL_FUNCTIONS = {"INCOME_STATEMENT", "BALANCE_SHEET"}
+
+# Keys Alpha Vantage uses for throttling and error replies, which must never be cached
+ERROR_KEYS = {"Note", "Information", "Error Message"}
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a response is not in the cache."""
+
+
+def cache_key(function, symbol, params):
+    """Content address of a request: hash of (function, symbol, params) without the API key."""
+    params = {k: v for k, v in params.items() if k != "apikey"}
+    raw = json.dumps({"function": function, "symbol": symbol, "params": params}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Gzip-compressed JSON store of raw API responses with per-function TTLs."""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_by_function=None, now=datetime.now):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_by_function = TTL_BY_FUNCTION if ttl_by_function is None else ttl_by_function
+        self.now = now
+
+    def path_for(self, function, symbol, params):
+        return self.cache_dir / function / f"{cache_key(function, symbol, params)}.json.gz"
+
+    def load(self, function, symbol, params):
+        """Return the cache entry `{..., "fetched_at", "data"}` or None."""
+        path = self.path_for(function, symbol, params)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, function, symbol, params, ignore_ttl=False):
+        """Return cached data if present and still fresh, else None."""
+        entry = self.load(function, symbol, params)
+        if entry is None:
+            return None
+        if ignore_ttl or self.is_fresh(entry):
+            return entry["data"]
+        return None
+
+    def put(self, function, symbol, params, data):
+        """Store a response. Throttling and error replies are ignored."""
+        if ERROR_KEYS & set(data):
+            return
+        path = self.path_for(function, symbol, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "function": function,
+            "symbol": symbol,
+            "params": {k: v for k, v in params.items() if k != "apikey"},
+            "fetched_at": self.now().isoformat(timespec="seconds"),
+            "data": data,
+        }
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, entry):
+        fetched_at = datetime.fromisoformat(entry["fetched_at"])
+        ttl = self.ttl_by_function.get(entry["function"], DEFAULT_TTL)
+        if self.now() - fetched_at > ttl:
+            return False
+
+        if entry["function"] in FUNDAMENTAL_FUNCTIONS:
+            latest_report = self.latest_report_date(entry["symbol"])
+            if latest_report is not None and latest_report > fetched_at:
+                return False
+        return True
+
+    def latest_report_date(self, symbol):
+        """Latest earnings report date seen in the cached EARNINGS response, if any."""
+        earnings = self.get("EARNINGS", symbol, {}, ignore_ttl=True)
+        if not earnings:
+            return None
+        dates = [entry.get("reportedDate") for entry in earnings.get("quarterlyEarnings", [])]
+        dates = [d for d in dates if d]
+        if not dates:
+            return None
+        return datetime.strptime(max(dates), "%Y-%m-%d")
@@ -1,6 +1,17 @@
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import hashlib
+import json
+import os
+import re
 import sqlite3
+import time
 import pandas as pd
+import analytics
+from instrumentation import count
+from query_results import read_result, typed_result
+from schema import has_column
 
 #==================================================
 #                 RUN SQL QUERIES
@@ -19,51 +30,310 @@ if BASE_DIR.name == "scripts": # Move up one level
 DB_PATH = BASE_DIR / "database" / "MarketData.db"
 QUERIES_DIR = BASE_DIR / "queries"
 RESULTS_DIR = BASE_DIR / "results"
+CACHE_INDEX_PATH = RESULTS_DIR / ".query_cache.json"
 
-# Check required files and folders
-if not DB_PATH.exists():
-    raise FileNotFoundError(f"Database file not found at: {DB_PATH}")
+# DATE('now', ...) expressions, whose values move the queries' date windows
+NOW_EXPRESSION = re.compile(r"DATE\(\s*'now'[^)]*\)", re.IGNORECASE)
 
-if not QUERIES_DIR.exists():
-    raise FileNotFoundError(f"Queries folder not found at: {QUERIES_DIR}")
 
-if not RESULTS_DIR.exists():
-    RESULTS_DIR.mkdir(parents=True)
+def check_paths():
+    # Check required files and folders
+    if not DB_PATH.exists():
+        raise FileNotFoundError(f"Database file not found at: {DB_PATH}")
 
-def run_query_with_preview(query_file: str):
+    if not QUERIES_DIR.exists():
+        raise FileNotFoundError(f"Queries folder not found at: {QUERIES_DIR}")
+
+    if not RESULTS_DIR.exists():
+        RESULTS_DIR.mkdir(parents=True)
+
+
+def check_schema():
+    """Fail early on a database built before stock_prices.trading_day, which the event queries look up."""
+    conn = connect_read_only()
+    try:
+        missing = not has_column(conn, "stock_prices", "trading_day")
+    finally:
+        conn.close()
+    if missing:
+        raise RuntimeError(f"{DB_PATH.name} has no stock_prices.trading_day column, which the queries need. "
+                           "Rerun `python scripts/load_to_db.py` to rebuild it (or with --incremental to add "
+                           "the column in place).")
+
+
+def connect_read_only():
+    """Open the database read-only, so concurrent readers never take write locks."""
+    return sqlite3.connect(f"{DB_PATH.as_uri()}?mode=ro", uri=True)
+
+
+#==================================================
+#               QUERY RESULT CACHE
+#==================================================
+
+def normalize_sql(sql):
+    """Strip comments and collapse whitespace, so formatting edits keep the cache warm."""
+    sql = re.sub(r"--[^\n]*", " ", sql)
+    return " ".join(sql.split())
+
+
+def table_versions(conn):
+    """Return {table: version} maintained by load_to_db.py, or None for older databases."""
+    try:
+        return dict(conn.execute("SELECT table_name, version FROM table_versions"))
+    except sqlite3.OperationalError:
+        return None
+
+
+def cache_key(sql, conn, versions):
+    """Hash of the normalized SQL, the versions of the tables it reads and its 'now' windows.
+
+    Each DATE('now', ...) expression is evaluated, so the key changes exactly
+    when a query's date window moves (e.g. at the start of a new month).
+    """
+    normalized = normalize_sql(sql)
+    referenced = {table: version for table, version in versions.items()
+                  if re.search(rf"\b{re.escape(table)}\b", normalized)}
+    windows = [conn.execute(f"SELECT {expression}").fetchone()[0]
+               for expression in NOW_EXPRESSION.findall(normalized)]
+    raw = json.dumps({"sql": normalized, "tables": referenced, "windows": windows}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def load_cache_index():
+    if not CACHE_INDEX_PATH.exists():
+        return {}
+    with open(CACHE_INDEX_PATH, "r") as file:
+        return json.load(file)
+
+
+def save_cache_index(index):
+    with open(CACHE_INDEX_PATH, "w") as file:
+        json.dump(index, file, indent=2, sort_keys=True)
+
+
+def result_path_for(query_file: str):
+    return RESULTS_DIR / query_file.replace(".sql", ".csv")
+
+
+#==================================================
+#                 RUN QUERIES
+#==================================================
+
+def execute_query(query_file: str):
+    """Run one query on its own read-only connection. Returns (sql, result, seconds)."""
     query_path = QUERIES_DIR / query_file
 
     # Load the SQL query
     with open(query_path, 'r') as file:
         sql = file.read()
 
+    # Connect to database and run query
+    start = time.perf_counter()
+    conn = connect_read_only()
+    try:
+        df = pd.read_sql_query(sql, conn)
+    except Exception as e:
+        raise RuntimeError(f"Error running {query_file}: {e}")
+    finally:
+        conn.close()
+    return sql, df, time.perf_counter() - start
+
+
+def save_with_preview(query_file: str, sql: str, df: pd.DataFrame, elapsed: float, save_csv=True):
     # Print description and SQL code
     print("="*80)
     print(f"QUERY FILE: {query_file}")
     print("="*80, "\n")
     print(sql)
     print("-"*80)
-    
-    # Connect to database and run query
-    with sqlite3.connect(DB_PATH) as conn:
-        try:
-            df = pd.read_sql_query(sql, conn)
-        except Exception as e:
-            print(f"Error running {query_file}: {e}")
-            raise RuntimeError(f"Error running {query_file}: {e}")
 
     # Save result
-    result_file = query_file.replace(".sql", ".csv")
-    result_path = RESULTS_DIR / result_file
-    df.to_csv(result_path, index=False)
+    if save_csv:
+        df.to_csv(result_path_for(query_file), index=False)
+    count("rows_out", len(df))
 
     # Output preview
-    print("\nResult preview:\n")
+    print(f"\nResult preview ({len(df)} rows in {elapsed:.2f}s):\n")
     print(df.head(), "\n\n")
-    
-# Create list if all sql queries in query folder 
-query_files = [file.name for file in QUERIES_DIR.glob("*.sql")]
-    
-# Execute all sql queries
-for query_file in query_files:
-    run_query_with_preview(query_file)
+
+
+def run_query_with_preview(query_file: str):
+    sql, df, elapsed = execute_query(query_file)
+    save_with_preview(query_file, sql, df, elapsed)
+
+
+def run_all_queries(workers=None, executor="thread", use_cache=True, save_csv=True):
+    """Run every query in queries/ concurrently and print previews in file name order.
+
+    The queries are independent reads, so total runtime approaches that of the
+    slowest query. SQLite releases the GIL while executing, so threads run the
+    queries in parallel; use executor="process" to also parallelize the
+    DataFrame construction. Queries whose SQL, input tables and date windows
+    are unchanged since the last run are served from results/ without running.
+
+    Returns {result name: DataFrame} with date columns parsed (see
+    query_results.py). With save_csv=False nothing is written to results/.
+    """
+    check_paths()
+    check_schema()
+
+    # Create sorted list of all sql queries in query folder
+    query_files = sorted(file.name for file in QUERIES_DIR.glob("*.sql"))
+    workers = workers or min(len(query_files), os.cpu_count() or 1) or 1
+
+    # Work out which saved results are still valid
+    cache_index = load_cache_index() if use_cache else {}
+    keys = {}
+    conn = connect_read_only()
+    try:
+        versions = table_versions(conn)
+        if versions is not None:
+            for query_file in query_files:
+                keys[query_file] = cache_key((QUERIES_DIR / query_file).read_text(), conn, versions)
+    finally:
+        conn.close()
+    cached = {query_file for query_file in query_files
+              if query_file in keys and cache_index.get(query_file) == keys[query_file]
+              and result_path_for(query_file).exists()}
+
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    results = {}
+    start = time.perf_counter()
+    with pool_class(max_workers=workers) as pool:
+        futures = {query_file: pool.submit(execute_query, query_file)
+                   for query_file in query_files if query_file not in cached}
+
+        # Print in a deterministic order as results become available
+        for query_file in query_files:
+            if query_file in cached:
+                sql = (QUERIES_DIR / query_file).read_text()
+                results[Path(query_file).stem] = print_cached_preview(query_file, sql)
+                continue
+            try:
+                sql, df, elapsed = futures[query_file].result()
+            except RuntimeError as e:
+                print(e)
+                raise
+            save_with_preview(query_file, sql, df, elapsed, save_csv=save_csv)
+            results[Path(query_file).stem] = typed_result(Path(query_file).stem, df)
+            if query_file in keys and save_csv:
+                cache_index[query_file] = keys[query_file]
+
+    if save_csv:
+        save_cache_index({query_file: key for query_file, key in cache_index.items() if query_file in query_files})
+    print(f"Ran {len(futures)} queries ({len(cached)} cached) in {time.perf_counter() - start:.2f}s "
+          f"using {workers} {executor} worker(s)")
+    return results
+
+
+def run_all_analyses(save_csv=True):
+    """Compute every query's result with the in-memory pandas engine (analytics.py).
+
+    Returns {result name: DataFrame}, like run_all_queries().
+    """
+    check_paths()
+    query_files = sorted(file.name for file in QUERIES_DIR.glob("*.sql") if file.name in analytics.ANALYSES)
+
+    start = time.perf_counter()
+    frames = analytics.load_frames()
+    print(f"Loaded datasets in {time.perf_counter() - start:.2f}s")
+
+    cache_index = load_cache_index()
+    results = {}
+    for query_file in query_files:
+        analysis = analytics.ANALYSES[query_file]
+        analysis_start = time.perf_counter()
+        df = analysis(frames)
+        save_with_preview(query_file, f"-- Computed in memory by analytics.{analysis.__name__}()\n", df,
+                          time.perf_counter() - analysis_start, save_csv=save_csv)
+        results[Path(query_file).stem] = typed_result(Path(query_file).stem, df)
+        # The SQL result cache no longer describes this file
+        cache_index.pop(query_file, None)
+
+    if save_csv:
+        save_cache_index(cache_index)
+    print(f"Computed {len(query_files)} results in {time.perf_counter() - start:.2f}s with the pandas engine")
+    return results
+
+
+def main(engine="sql", workers=None, executor="thread", use_cache=True, save_csv=True):
+    """Compute every result with the chosen engine. Returns {result name: DataFrame}."""
+    if engine == "pandas":
+        return run_all_analyses(save_csv=save_csv)
+    return run_all_queries(workers=workers, executor=executor, use_cache=use_cache, save_csv=save_csv)
+
+
+def frames_match(expected: pd.DataFrame, actual: pd.DataFrame):
+    """Compare two results ignoring row order and integer/float dtype differences. Returns (ok, message)."""
+    if sorted(expected.columns) != sorted(actual.columns):
+        return False, f"columns differ: {list(expected.columns)} vs {list(actual.columns)}"
+    columns = list(expected.columns)
+    expected = expected.sort_values(columns, ignore_index=True)
+    actual = actual[columns].sort_values(columns, ignore_index=True)
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=1e-9)
+    except AssertionError as e:
+        return False, str(e)
+    return True, f"{len(expected)} rows"
+
+
+def check_parity(require_rows=False):
+    """Run every query with both engines and report whether the results agree.
+
+    With `require_rows`, a query that returns no rows on both engines fails,
+    since nothing was compared.
+    """
+    check_paths()
+    check_schema()
+    frames = analytics.load_frames()
+    query_files = sorted(file.name for file in QUERIES_DIR.glob("*.sql"))
+
+    all_ok = True
+    for query_file in query_files:
+        if query_file not in analytics.ANALYSES:
+            print(f"MISSING  {query_file}: no pandas implementation")
+            all_ok = False
+            continue
+        _, sql_df, _ = execute_query(query_file)
+        ok, message = frames_match(sql_df, analytics.ANALYSES[query_file](frames))
+        if ok and require_rows and sql_df.empty:
+            ok, message = False, "no rows to compare"
+        print(f"{'OK' if ok else 'DIFF':<8} {query_file}: {message}")
+        all_ok = all_ok and ok
+    return all_ok
+
+
+def print_cached_preview(query_file: str, sql: str):
+    print("="*80)
+    print(f"QUERY FILE: {query_file}")
+    print("="*80, "\n")
+    print(sql)
+    print("-"*80)
+    df = read_result(Path(query_file).stem)
+    count("rows_in", len(df))
+    print("\nResult preview (cached, inputs unchanged):\n")
+    print(df.head(), "\n\n")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run all SQL queries in queries/ and save the results.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of parallel workers (default: one per query, up to the CPU count)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="run queries in a thread pool (default) or a process pool")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="run every query even if its inputs are unchanged since the last run")
+    parser.add_argument("--engine", choices=["sql", "pandas"], default="sql",
+                        help="run the SQL files on the database (default) or compute them in memory from data/")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="compute the results without writing them to results/")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="compare the results of both engines instead of saving them")
+    parser.add_argument("--require-rows", action="store_true",
+                        help="with --check-parity, fail queries that return no rows, as nothing was compared")
+    args = parser.parse_args()
+    if args.check_parity:
+        raise SystemExit(0 if check_parity(require_rows=args.require_rows) else 1)
+    main(engine=args.engine, workers=args.workers, executor=args.executor,
+         use_cache=not args.no_cache, save_csv=not args.no_csv)
@@ -0,0 +1,248 @@
+import uuid
+
+
+#==================================================
+#              DATABASE SCHEMA
+#==================================================
+
+# Explicit table definitions for MarketData.db. Every table has a typed column
+# list and a primary key on its natural key. Dates are stored as ISO-8601 TEXT
+# (YYYY-MM-DD) so SQLite's date functions and string comparisons both work.
+# stock_prices is a WITHOUT ROWID table, clustered on (symbol, date), so range
+# scans and point lookups per symbol read the price columns straight from the
+# primary key B-tree. Its trading_day column is not part of the CSV: the loader
+# numbers each symbol's trading days 1, 2, 3, ... by date, so offsets such as
+# "report day + 5" are index lookups instead of a ROW_NUMBER() window per query.
+
+TABLE_DDL = {
+    "stock_prices": """
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            symbol  TEXT NOT NULL,
+            date    TEXT NOT NULL,
+            open    REAL,
+            high    REAL,
+            low     REAL,
+            close   REAL,
+            volume  REAL,
+            trading_day  INTEGER,
+            PRIMARY KEY (symbol, date)
+        ) WITHOUT ROWID
+    """,
+    "annual_earnings": """
+        CREATE TABLE IF NOT EXISTS annual_earnings (
+            symbol        TEXT NOT NULL,
+            fiscal_year   TEXT NOT NULL,
+            reported_EPS  REAL,
+            PRIMARY KEY (symbol, fiscal_year)
+        )
+    """,
+    "quarterly_earnings": """
+        CREATE TABLE IF NOT EXISTS quarterly_earnings (
+            symbol          TEXT NOT NULL,
+            fiscal_quarter  TEXT NOT NULL,
+            reported_date   TEXT,
+            reported_EPS    REAL,
+            estimated_EPS   REAL,
+            surprise        REAL,
+            surprise_pct    REAL,
+            report_time     TEXT,
+            PRIMARY KEY (symbol, fiscal_quarter)
+        )
+    """,
+    "income_statements": """
+        CREATE TABLE IF NOT EXISTS income_statements (
+            symbol                             TEXT NOT NULL,
+            report_type                        TEXT NOT NULL,
+            fiscal_date                        TEXT,
+            reported_currency                  TEXT,
+            grossProfit                        INTEGER,
+            totalRevenue                       INTEGER,
+            costOfRevenue                      INTEGER,
+            costofGoodsAndServicesSold         INTEGER,
+            operatingIncome                    INTEGER,
+            sellingGeneralAndAdministrative    INTEGER,
+            researchAndDevelopment             INTEGER,
+            operatingExpenses                  INTEGER,
+            investmentIncomeNet                INTEGER,
+            netInterestIncome                  INTEGER,
+            interestIncome                     INTEGER,
+            interestExpense                    INTEGER,
+            nonInterestIncome                  INTEGER,
+            otherNonOperatingIncome            INTEGER,
+            depreciation                       INTEGER,
+            depreciationAndAmortization        INTEGER,
+            incomeBeforeTax                    INTEGER,
+            incomeTaxExpense                   INTEGER,
+            interestAndDebtExpense             INTEGER,
+            netIncomeFromContinuingOperations  INTEGER,
+            comprehensiveIncomeNetOfTax        INTEGER,
+            ebit                               INTEGER,
+            ebitda                             INTEGER,
+            netIncome                          INTEGER,
+            PRIMARY KEY (symbol, report_type, fiscal_date)
+        )
+    """,
+    "balance_sheets": """
+        CREATE TABLE IF NOT EXISTS balance_sheets (
+            symbol                                  TEXT NOT NULL,
+            report_type                             TEXT NOT NULL,
+            fiscal_date                             TEXT,
+            reported_currency                       TEXT,
+            totalAssets                             INTEGER,
+            totalCurrentAssets                      INTEGER,
+            cashAndCashEquivalentsAtCarryingValue   INTEGER,
+            cashAndShortTermInvestments             INTEGER,
+            inventory                               INTEGER,
+            currentNetReceivables                   INTEGER,
+            totalNonCurrentAssets                   INTEGER,
+            propertyPlantEquipment                  INTEGER,
+            accumulatedDepreciationAmortizationPPE  INTEGER,
+            intangibleAssets                        INTEGER,
+            intangibleAssetsExcludingGoodwill       INTEGER,
+            goodwill                                INTEGER,
+            investments                             INTEGER,
+            longTermInvestments                     INTEGER,
+            shortTermInvestments                    INTEGER,
+            otherCurrentAssets                      INTEGER,
+            otherNonCurrentAssets                   INTEGER,
+            totalLiabilities                        INTEGER,
+            totalCurrentLiabilities                 INTEGER,
+            currentAccountsPayable                  INTEGER,
+            deferredRevenue                         INTEGER,
+            currentDebt                             INTEGER,
+            shortTermDebt                           INTEGER,
+            totalNonCurrentLiabilities              INTEGER,
+            capitalLeaseObligations                 INTEGER,
+            longTermDebt                            INTEGER,
+            currentLongTermDebt                     INTEGER,
+            longTermDebtNoncurrent                  INTEGER,
+            shortLongTermDebtTotal                  INTEGER,
+            otherCurrentLiabilities                 INTEGER,
+            otherNonCurrentLiabilities              INTEGER,
+            totalShareholderEquity                  INTEGER,
+            treasuryStock                           INTEGER,
+            retainedEarnings                        INTEGER,
+            commonStock                             INTEGER,
+            commonStockSharesOutstanding            INTEGER,
+            PRIMARY KEY (symbol, report_type, fiscal_date)
+        )
+    """,
+    "company_overviews": """
+        CREATE TABLE IF NOT EXISTS company_overviews (
+            symbol                      TEXT NOT NULL PRIMARY KEY,
+            Name                        TEXT,
+            CIK                         INTEGER,
+            MarketCapitalization        INTEGER,
+            EBITDA                      INTEGER,
+            PERatio                     REAL,
+            PEGRatio                    REAL,
+            EPS                         REAL,
+            ProfitMargin                REAL,
+            ReturnOnEquityTTM           REAL,
+            RevenueTTM                  INTEGER,
+            QuarterlyEarningsGrowthYOY  REAL,
+            QuarterlyRevenueGrowthYOY   REAL,
+            PriceToBookRatio            REAL,
+            DividendYield               REAL,
+            Beta                        REAL
+        )
+    """,
+}
+
+# Version stamp per table, replaced with a fresh random token every time the
+# loader writes to the table. run_queries.py keys its result cache on these.
+TABLE_VERSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name  TEXT NOT NULL PRIMARY KEY,
+        version     TEXT NOT NULL,
+        loaded_at   TEXT NOT NULL
+    )
+"""
+
+# Covering indexes for the joins in queries/: each holds the join keys plus
+# the columns the queries read, so the base table is never visited.
+INDEX_DDL = [
+    # Event offsets look up prices by (symbol, trading_day)
+    """
+    CREATE INDEX IF NOT EXISTS idx_stock_prices_trading_day
+        ON stock_prices (symbol, trading_day, close)
+    """,
+    # Earnings events are joined to prices on (symbol, reported_date = date)
+    """
+    CREATE INDEX IF NOT EXISTS idx_quarterly_earnings_reported
+        ON quarterly_earnings (symbol, reported_date, fiscal_quarter, surprise_pct)
+    """,
+    # Annual fundamentals are joined on (symbol, report_type, fiscal_date)
+    """
+    CREATE INDEX IF NOT EXISTS idx_income_statements_ratios
+        ON income_statements (symbol, report_type, fiscal_date, totalRevenue, costOfRevenue, netIncome)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_balance_sheets_ratios
+        ON balance_sheets (symbol, report_type, fiscal_date, totalAssets, totalShareholderEquity,
+                           commonStockSharesOutstanding)
+    """,
+]
+
+
+def create_schema(conn):
+    """Create all tables and indexes that do not exist yet."""
+    for ddl in TABLE_DDL.values():
+        conn.execute(ddl)
+
+    # Databases built before trading_day existed get the column added
+    if not has_column(conn, "stock_prices", "trading_day"):
+        conn.execute("ALTER TABLE stock_prices ADD COLUMN trading_day INTEGER")
+
+    for ddl in INDEX_DDL:
+        conn.execute(ddl)
+    conn.execute(TABLE_VERSIONS_DDL)
+
+
+def bump_table_version(conn, table_name):
+    """Mark a table as changed so cached query results that read it are invalidated."""
+    conn.execute(
+        """
+        INSERT INTO table_versions (table_name, version, loaded_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT (table_name) DO UPDATE SET version = excluded.version, loaded_at = excluded.loaded_at
+        """,
+        (table_name, uuid.uuid4().hex),
+    )
+
+
+def refresh_trading_days(conn, all_symbols=False):
+    """Number each symbol's trading days by date in stock_prices.trading_day.
+
+    Only symbols with unnumbered rows (newly inserted prices) are renumbered,
+    unless `all_symbols` is set. Returns the number of symbols renumbered.
+    """
+    if all_symbols:
+        symbols = [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM stock_prices")]
+    else:
+        symbols = [row[0] for row in conn.execute("SELECT DISTINCT symbol FROM stock_prices WHERE trading_day IS NULL")]
+
+    for symbol in symbols:
+        conn.execute(
+            """
+            UPDATE stock_prices
+            SET trading_day = numbered.rn
+            FROM (
+                SELECT date, ROW_NUMBER() OVER (ORDER BY date) AS rn
+                FROM stock_prices
+                WHERE symbol = ?
+            ) AS numbered
+            WHERE stock_prices.symbol = ? AND stock_prices.date = numbered.date
+            """,
+            (symbol, symbol),
+        )
+    return len(symbols)
+
+
+def has_column(conn, table_name, column):
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table_name})"))
+
+
+def has_primary_key(conn, table_name):
+    """True if the table was created from this schema (legacy to_sql tables have no primary key)."""
+    return any(row[5] for row in conn.execute(f"PRAGMA table_info({table_name})"))
@@ -0,0 +1,423 @@
+from pathlib import Path
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+import pandas as pd
+from instrumentation import count
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # Columnar formats are optional
+    pa = None
+
+
+#==================================================
+#               DATASET STORAGE
+#==================================================
+
+# Read/write layer for the datasets in data/. CSV stays the default; Parquet
+# and Arrow IPC (Feather v2) are optional columnar backends that need pyarrow.
+# Select one with the DATA_FORMAT environment variable (csv, parquet, arrow).
+# DATA_LAYOUT=partitioned stores each dataset as one file per symbol (and per
+# year for prices) under data/<dataset>/, with a manifest of each partition's
+# rows, date range and hash, so a refresh only rewrites the partitions that
+# changed and the loader only reads those.
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+DATA_DIR = BASE_DIR / "data"
+
+FORMAT_SUFFIXES = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+DATASETS = [
+    "stock_prices",
+    "annual_earnings",
+    "quarterly_earnings",
+    "income_statements",
+    "balance_sheets",
+    "company_overviews",
+]
+
+LAYOUTS = ["single", "partitioned"]
+
+# Date column of each dataset, summarized per partition in the manifest
+DATASET_DATES = {
+    "stock_prices": "date",
+    "annual_earnings": "fiscal_year",
+    "quarterly_earnings": "fiscal_quarter",
+    "income_statements": "fiscal_date",
+    "balance_sheets": "fiscal_date",
+    "company_overviews": None,
+}
+
+# Datasets partitioned by year as well as by symbol
+YEAR_PARTITIONED = ["stock_prices"]
+
+MANIFEST_NAME = "_manifest.json"
+
+
+def data_format():
+    fmt = os.getenv("DATA_FORMAT", "csv").lower()
+    if fmt not in FORMAT_SUFFIXES:
+        raise ValueError(f"Unknown DATA_FORMAT '{fmt}'. Use one of: {', '.join(FORMAT_SUFFIXES)}")
+    return fmt
+
+
+def data_layout():
+    layout = os.getenv("DATA_LAYOUT", "single").lower()
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown DATA_LAYOUT '{layout}'. Use one of: {', '.join(LAYOUTS)}")
+    return layout
+
+
+def require_pyarrow(fmt):
+    if fmt != "csv" and pa is None:
+        raise ImportError(f"The '{fmt}' data format requires pyarrow: pip install pyarrow")
+
+
+def dataset_path(name, fmt=None):
+    return DATA_DIR / f"{name}{FORMAT_SUFFIXES[fmt or data_format()]}"
+
+
+def find_dataset(name, fmt=None):
+    """Path of a stored dataset, preferring `fmt` (or DATA_FORMAT), else any existing format."""
+    preferred = dataset_path(name, fmt)
+    if preferred.exists():
+        return preferred
+    for suffix in FORMAT_SUFFIXES.values():
+        path = DATA_DIR / f"{name}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def format_of(path):
+    return {suffix: fmt for fmt, suffix in FORMAT_SUFFIXES.items()}[path.suffix]
+
+
+#==================================================
+#               PARTITIONED LAYOUT
+#==================================================
+
+def partition_dir(name):
+    return DATA_DIR / name
+
+
+def partition_path(name, symbol, year=None, fmt=None):
+    """data/<name>/<symbol>.<ext>, or data/<name>/<symbol>/<year>.<ext> for year partitions."""
+    suffix = FORMAT_SUFFIXES[fmt or data_format()]
+    if year is None:
+        return partition_dir(name) / f"{symbol}{suffix}"
+    return partition_dir(name) / symbol / f"{year}{suffix}"
+
+
+def read_manifest(name):
+    """{path relative to data/<name>/: {"symbol", "year", "rows", "min_date", "max_date", "sha256"}}."""
+    path = partition_dir(name) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def write_manifest(name, manifest):
+    """Replace the manifest atomically, so readers never see a partial file."""
+    path = partition_dir(name) / MANIFEST_NAME
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temp_path, path)
+
+
+def partition_entries(name):
+    """{partition path: manifest entry} of a partitioned dataset, in manifest order."""
+    directory = partition_dir(name)
+    return {directory / relative: entry for relative, entry in read_manifest(name).items()}
+
+
+def stored_layout(name, fmt=None):
+    """"single" or "partitioned" for a stored dataset, preferring DATA_LAYOUT if both exist. None if not stored."""
+    partitioned = bool(read_manifest(name))
+    single = find_dataset(name, fmt) is not None
+    if partitioned and (data_layout() == "partitioned" or not single):
+        return "partitioned"
+    return "single" if single else None
+
+
+def dataset_files(name, fmt=None):
+    """Files holding a stored dataset: its single file or its partitions (empty if not stored)."""
+    layout = stored_layout(name, fmt)
+    if layout == "partitioned":
+        return list(partition_entries(name))
+    return [find_dataset(name, fmt)] if layout == "single" else []
+
+
+def date_range(values):
+    values = values.dropna()
+    if values.empty:
+        return None, None
+    return str(values.min()), str(values.max())
+
+
+def serialize(df, fmt):
+    """File content of `df` in `fmt` as bytes, so unchanged partitions can be skipped by hash."""
+    buffer = io.BytesIO()
+    if fmt == "csv":
+        df.to_csv(buffer, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(buffer, index=False, compression="zstd")
+    else:
+        feather.write_feather(df, buffer, compression="uncompressed")
+    return buffer.getvalue()
+
+
+def split_partitions(df, name):
+    """Yield ((symbol, year or None), rows) for each partition of `df`, in order of appearance."""
+    keys = [df["symbol"].astype(str)]
+    if name in YEAR_PARTITIONED:
+        keys.append(df[DATASET_DATES[name]].astype(str).str[:4])
+    for key, part in df.groupby(keys, sort=False, observed=True):
+        symbol, year = (key + (None,))[:2]
+        yield (symbol, year), part
+
+
+def write_partitions(df, name, fmt, merge_on=None):
+    """Write the partitions of the symbols in `df` and return the paths written.
+
+    Partitions whose content did not change are skipped, and those of other
+    symbols are left alone. By default each symbol's partitions are replaced,
+    dropping any it no longer has; with `merge_on`, the rows are merged into
+    the stored partitions, the new rows winning on those key columns.
+    """
+    df = df.astype({"symbol": str})  # Plain strings, so a partition does not store every category
+    manifest = read_manifest(name)
+    directory = partition_dir(name)
+    date_column = DATASET_DATES[name]
+    written, kept = [], set()
+
+    for (symbol, year), part in split_partitions(df, name):
+        stored = [relative for relative, entry in manifest.items()
+                  if entry["symbol"] == symbol and entry["year"] == year]
+        if merge_on and stored:
+            previous = [read_path(directory / relative) for relative in stored]
+            part = pd.concat(previous + [part], ignore_index=True)
+            part = part.drop_duplicates(subset=merge_on, keep="last")
+            if date_column:
+                part = part.sort_values(date_column, ascending=False, kind="stable")
+
+        path = partition_path(name, symbol, year, fmt)
+        relative = path.relative_to(directory).as_posix()
+        kept.add(relative)
+        content = serialize(part, fmt)
+        sha256 = hashlib.sha256(content).hexdigest()
+        if manifest.get(relative, {}).get("sha256") == sha256 and path.exists():
+            continue
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        count("rows_out", len(part))
+        min_date, max_date = date_range(part[date_column]) if date_column else (None, None)
+        manifest[relative] = {"symbol": symbol, "year": year, "rows": len(part),
+                              "min_date": min_date, "max_date": max_date, "sha256": sha256}
+        written.append(path)
+
+    # Drop stored partitions this write replaced, e.g. years a symbol no longer
+    # has or files in another format
+    touched = {(manifest[relative]["symbol"], manifest[relative]["year"]) for relative in kept}
+    symbols = {symbol for symbol, _ in touched}
+    for relative, entry in list(manifest.items()):
+        replaced = (entry["symbol"], entry["year"]) in touched if merge_on else entry["symbol"] in symbols
+        if replaced and relative not in kept:
+            (directory / relative).unlink(missing_ok=True)
+            del manifest[relative]
+
+    directory.mkdir(parents=True, exist_ok=True)
+    write_manifest(name, manifest)
+    return written
+
+
+def latest_dates(name):
+    """{symbol: latest date} of a stored dataset, from the manifest if it is partitioned."""
+    date_column = DATASET_DATES[name]
+    if stored_layout(name) == "partitioned":
+        latest = {}
+        for entry in read_manifest(name).values():
+            if entry["max_date"] is not None:
+                latest[entry["symbol"]] = max(latest.get(entry["symbol"], entry["max_date"]), entry["max_date"])
+        return latest
+    path = find_dataset(name)
+    if path is None:
+        return {}
+    stored = read_path(path, columns=["symbol", date_column])
+    return stored.dropna().groupby("symbol")[date_column].max().astype(str).to_dict()
+
+
+def normalize_dates(df):
+    """Store datetime columns as ISO dates (YYYY-MM-DD), exactly as the CSV files hold them."""
+    df = df.copy()
+    for column in df.select_dtypes(include=["datetime", "datetimetz"]).columns:
+        df[column] = df[column].dt.strftime("%Y-%m-%d")
+    return df
+
+
+def write_dataset(df, name, fmt=None, merge_on=None):
+    """Write a dataset in the configured format and layout and return its path.
+
+    In the partitioned layout only the partitions of the symbols in `df` are
+    written (see write_partitions()), and the path is the dataset directory.
+    """
+    fmt = fmt or data_format()
+    require_pyarrow(fmt)
+    df = normalize_dates(df)
+    if data_layout() == "partitioned":
+        write_partitions(df, name, fmt, merge_on)
+        return partition_dir(name)
+
+    path = dataset_path(name, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count("rows_out", len(df))
+
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        feather.write_feather(df, path, compression="uncompressed")  # Uncompressed so reads can be memory-mapped
+    return path
+
+
+def replace_symbols(df, name):
+    """Write `df` in place of the stored rows of its symbols, keeping every other symbol's rows."""
+    if data_layout() == "partitioned" and stored_layout(name) != "single":
+        return write_dataset(df, name)
+    stored = read_dataset(name)
+    if stored is not None:
+        others = stored[~stored["symbol"].astype(str).isin(df["symbol"].astype(str).unique())]
+        df = pd.concat([others.astype({"symbol": str}), normalize_dates(df).astype({"symbol": str})],
+                       ignore_index=True)
+    return write_dataset(df, name)
+
+
+def read_dataset(name, columns=None, fmt=None, dtype=None):
+    """Read a dataset, optionally only `columns`. Returns None if it does not exist.
+
+    Parquet and Arrow files only decode the requested columns; Arrow files are
+    memory-mapped rather than read into memory. Partitions are concatenated.
+    """
+    paths = dataset_files(name, fmt)
+    if not paths:
+        return None
+    if len(paths) == 1:
+        return read_path(paths[0], columns, dtype)
+    return pd.concat([read_path(path, columns, dtype) for path in paths], ignore_index=True)
+
+
+def read_path(path, columns=None, dtype=None):
+    """Read a stored dataset, optionally only `columns`, converting columns named in `dtype`."""
+    fmt = format_of(path)
+    require_pyarrow(fmt)
+    if fmt == "csv":
+        df = pd.read_csv(path, usecols=columns, dtype=dtype)
+    elif fmt == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    if dtype and fmt != "csv":
+        df = df.astype({column: kind for column, kind in dtype.items() if column in df.columns})
+    count("rows_in", len(df))
+    return df
+
+
+def dataset_columns(path):
+    """Column names of a stored dataset, read from the header or file schema only."""
+    fmt = format_of(path)
+    require_pyarrow(fmt)
+    if fmt == "csv":
+        return list(pd.read_csv(path, nrows=0).columns)
+    if fmt == "parquet":
+        return pq.read_schema(path).names
+    return feather.read_table(path, memory_map=True).schema.names
+
+
+def iter_batches(path, batch_size, columns=None):
+    """Yield DataFrames of at most `batch_size` rows from a columnar file."""
+    fmt = format_of(path)
+    require_pyarrow(fmt)
+    if fmt == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+    elif fmt == "arrow":
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=batch_size)
+
+
+def convert_all(fmt):
+    """Convert every CSV dataset in data/ to `fmt` and report size and read time."""
+    require_pyarrow(fmt)
+    rows = []
+    for name in DATASETS:
+        csv_path = dataset_path(name, "csv")
+        if not csv_path.exists():
+            continue
+        df = pd.read_csv(csv_path)
+        path = write_dataset(df, name, fmt)
+
+        timings = {}
+        for label, source in [("csv", csv_path), (fmt, path)]:
+            start = time.perf_counter()
+            read_path(source)
+            timings[label] = 1000 * (time.perf_counter() - start)
+
+        rows.append({
+            "dataset": name,
+            "csv_kb": round(csv_path.stat().st_size / 1024, 1),
+            f"{fmt}_kb": round(path.stat().st_size / 1024, 1),
+            "csv_read_ms": round(timings["csv"], 1),
+            f"{fmt}_read_ms": round(timings[fmt], 1),
+        })
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    return report
+
+
+def partition_all(fmt=None):
+    """Split every single-file dataset in data/ into partitions in `fmt` (or DATA_FORMAT)."""
+    fmt = fmt or data_format()
+    require_pyarrow(fmt)
+    for name in DATASETS:
+        path = find_dataset(name)
+        if path is None:
+            continue
+        written = write_partitions(normalize_dates(read_path(path)), name, fmt)
+        print(f"Wrote {len(written)} of {len(read_manifest(name))} partitions of {name} to {partition_dir(name)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the CSV datasets in data/ to a columnar format, "
+                                                 "or split the datasets into per-symbol partitions.")
+    parser.add_argument("format", choices=["parquet", "arrow", "partitioned"],
+                        help="target storage format, or 'partitioned' for partitions in DATA_FORMAT")
+    args = parser.parse_args()
+    if args.format == "partitioned":
+        partition_all()
+    else:
+        convert_all(args.format)
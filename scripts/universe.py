@@ -0,0 +1,100 @@
+from pathlib import Path
+import os
+import zlib
+import pandas as pd
+
+#==================================================
+#                SYMBOL UNIVERSE
+#==================================================
+
+# The ticker symbols every stage works on, read from universe.txt in the
+# project root (one symbol per line, '#' starts a comment). Point the
+# UNIVERSE_FILE environment variable at another file to use a different
+# universe. Large universes are split into shards, e.g. one fetch or load
+# worker per shard. A symbol's shard only depends on the symbol and the number
+# of shards, so fetching and loading (on any machine) agree on it.
+
+# Set project root directory dynamically
+try:
+    BASE_DIR = Path(__file__).resolve().parent  # Normal execution
+except NameError:
+    BASE_DIR = Path().cwd()  # Interactive mode (Spyder)
+
+if BASE_DIR.name == "scripts": # Move up one level
+    BASE_DIR = BASE_DIR.parent
+
+UNIVERSE_FILE = BASE_DIR / "universe.txt"
+UNIVERSE_FILE_ENV = "UNIVERSE_FILE"
+
+# Used when there is no universe file
+DEFAULT_SYMBOLS = ["JNJ", "PFE", "UNH", "MDT"]
+
+
+def universe_path():
+    return Path(os.getenv(UNIVERSE_FILE_ENV) or UNIVERSE_FILE)
+
+
+def load_universe(path=None):
+    """Symbols of the universe file in file order, without duplicates."""
+    path = Path(path) if path else universe_path()
+    if not path.exists():
+        return list(DEFAULT_SYMBOLS)
+
+    symbols = []
+    with open(path, "r") as file:
+        for line in file:
+            symbol = line.split("#", 1)[0].strip().upper()
+            if symbol and symbol not in symbols:
+                symbols.append(symbol)
+    if not symbols:
+        raise ValueError(f"No symbols found in {path}")
+    return symbols
+
+
+def symbol_shard(symbol, shards):
+    """Shard of a symbol, from a stable hash of the symbol."""
+    return zlib.crc32(str(symbol).encode("utf-8")) % shards
+
+
+def shard_symbols(symbols, shards):
+    """Split `symbols` into `shards` lists by symbol_shard(), keeping their order within each shard.
+
+    Large universes get shards of similar size; a small one can leave some
+    shards empty.
+    """
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+    split = [[] for _ in range(shards)]
+    for symbol in symbols:
+        split[symbol_shard(symbol, shards)].append(symbol)
+    return split
+
+
+def parse_shard(text):
+    """(shard, shards) of a "i/N" string, with shards numbered from 0 to N - 1."""
+    try:
+        shard, shards = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Expected a shard as i/N, got {text!r}") from None
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} is not between 0 and {shards - 1}")
+    return shard, shards
+
+
+def shard_mask(symbols, shard, shards):
+    """Boolean mask of the rows of a symbol Series that belong to `shard`."""
+    selected = [symbol for symbol in pd.unique(symbols) if symbol_shard(symbol, shards) == shard]
+    return symbols.isin(selected)
+
+
+def universe_order(df, symbols, column="symbol"):
+    """Rows of `df` stably reordered to follow the universe order of their symbol.
+
+    Merging per-shard results with this gives the same row order as a
+    single-process run.
+    """
+    position = {symbol: index for index, symbol in enumerate(symbols)}
+    order = df[column].astype(object).map(position).fillna(len(symbols))
+    return df.iloc[order.argsort(kind="stable")].reset_index(drop=True)
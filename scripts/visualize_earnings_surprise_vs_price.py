@@ -1,7 +1,9 @@
 from pathlib import Path
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from figure_output import DEFAULT_DPI, DEFAULT_FORMATS, run_script, save_figure
+from instrumentation import count
+from query_results import read_result
 
 
 #====================================================================
@@ -18,61 +20,73 @@ except NameError:
 if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
 
-# Manage paths
-RESULTS_DIR = BASE_DIR / "results"
+# Query result plotted and output path
+RESULT_NAME = "earnings_surprise_vs_price_reaction"
 FIGURES_DIR = BASE_DIR / "figures"
-DATA_FILE = RESULTS_DIR / "earnings_surprise_vs_price_reaction.csv"
 OUTPUT_FILE = FIGURES_DIR / "earnings_surprise_vs_price.png"
-FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
 
-# Set context and style
-sns.set_style("white")
-sns.set_context("notebook")
-
-# Load data
-df = pd.read_csv(DATA_FILE)
-
-# Identify first and last date of data
-df["fiscal_quarter"] = pd.to_datetime(df["fiscal_quarter"])
-earliest_date = df["fiscal_quarter"].min()
-latest_date = df["fiscal_quarter"].max()
-
-
-# Remove outliers (keep 5th to 95th percentile)
-for col in ["surprise_pct","price_change_5d_pct"]:
-    lower = df[col].quantile(0.05)
-    upper = df[col].quantile(0.95)
-    df = df[(df[col] >= lower) & (df[col] <= upper)]
-
-g  = sns.lmplot(
-    data=df,
-    x="surprise_pct",
-    y="price_change_5d_pct",
-    col="name",
-    col_wrap=2,
-    facet_kws={"sharex": False, "sharey": True},
-    height=4,
-    aspect=1
+def main(df=None, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI, show=True):
+    """Plot the query result and save the figure in each of `formats`.
+
+    `df` is the result as returned by run_queries.py; without it the saved
+    CSV is read from results/.
+    """
+    FIGURES_DIR.mkdir(parents=True, exist_ok=True)
+
+
+    # Set context and style
+    sns.set_style("white")
+    sns.set_context("notebook")
+
+    # Load data
+    df = read_result(RESULT_NAME) if df is None else df.copy()
+    count("rows_in", len(df))
+    if df.empty:
+        print(f"No rows in {RESULT_NAME}, skipping {OUTPUT_FILE.name}")
+        return
+
+    # Identify first and last date of data
+    earliest_date = df["fiscal_quarter"].min()
+    latest_date = df["fiscal_quarter"].max()
+
+
+    # Remove outliers (keep 5th to 95th percentile)
+    for col in ["surprise_pct","price_change_5d_pct"]:
+        lower = df[col].quantile(0.05)
+        upper = df[col].quantile(0.95)
+        df = df[(df[col] >= lower) & (df[col] <= upper)]
+
+    g  = sns.lmplot(
+        data=df,
+        x="surprise_pct",
+        y="price_change_5d_pct",
+        col="name",
+        col_wrap=2,
+        facet_kws={"sharex": False, "sharey": True},
+        height=4,
+        aspect=1
+        )
+
+    g.fig.suptitle("Relationship Between Earnings Surprise and 5-Day Stock Price Reaction", y=1.05)
+    g.set_axis_labels("Earnings Surprise (%)", "5-Day Stock Price Change (%)")
+    g.set_titles("{col_name}")
+
+
+    plt.figtext(
+        0.01, -0.08,
+        "Note:\n"
+        "This figure illustrates the relationship between earnings surprise (in percentage) and the subsequent 5-day stock price reaction. "
+        "If an API key is provided, the data updates dynamically and includes the most recent 20 quarters. "
+        f"The current dataset spans from Q{earliest_date.quarter} {earliest_date.year} to Q{latest_date.quarter} {latest_date.year}. "
+        "To minimize the impact of extreme values, data is trimmed to the 5th–95th percentile.",
+        wrap=True,
+        horizontalalignment='left',
+        fontsize=10
     )
 
-g.fig.suptitle("Relationship Between Earnings Surprise and 5-Day Stock Price Reaction", y=1.05)
-g.set_axis_labels("Earnings Surprise (%)", "5-Day Stock Price Change (%)")
-g.set_titles("{col_name}")
-
-
-plt.figtext(
-    0.01, -0.08,
-    "Note:\n"
-    "This figure illustrates the relationship between earnings surprise (in percentage) and the subsequent 5-day stock price reaction. "
-    "If an API key is provided, the data updates dynamically and includes the most recent 20 quarters. "
-    f"The current dataset spans from Q{earliest_date.quarter} {earliest_date.year} to Q{latest_date.quarter} {latest_date.year}. "
-    "To minimize the impact of extreme values, data is trimmed to the 5th–95th percentile.",
-    wrap=True,
-    horizontalalignment='left',
-    fontsize=10
-)
+    save_figure(g.fig, OUTPUT_FILE, formats, dpi, show)
 
-plt.show()
 
-g.fig.savefig(OUTPUT_FILE, dpi=300, bbox_inches="tight")
+if __name__ == "__main__":
+    run_script(main, "Plot earnings surprise vs stock price reaction.")
@@ -1,9 +1,11 @@
 from pathlib import Path
-import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 import matplotlib.dates as mdates
 import seaborn as sns
+from figure_output import DEFAULT_DPI, DEFAULT_FORMATS, run_script, save_figure
+from instrumentation import count
+from query_results import read_result
 
 #===============================================================
 #         VISUALIZE CUMULATIVE 2% NET GAIN COUNTS
@@ -20,76 +22,80 @@ if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
     
     
-# Manage paths
-RESULTS_DIR = BASE_DIR / "results"
+# Query result plotted and output path
+RESULT_NAME = "monthly_net_2pct_gain_counts"
 FIGURES_DIR = BASE_DIR / "figures"
-DATA_FILE = RESULTS_DIR / "monthly_net_2pct_gain_counts.csv"
 OUTPUT_FILE = FIGURES_DIR / "monthly_net_2pct_gain_counts.png"
-FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Set context and style
-sns.set_style("whitegrid")
-sns.set_context("notebook")
 
-# Load data
-df = pd.read_csv(DATA_FILE)
+def main(df=None, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI, show=True):
+    """Plot the query result and save the figure in each of `formats`.
 
-# Generate cumulative gains
-df["month"] = pd.to_datetime(df["month"])
-df = df.sort_values(["symbol", "month"])
-df["cumulative_gains"] = df.groupby("symbol")["nr_net_gains"].cumsum()
+    `df` is the result as returned by run_queries.py; without it the saved
+    CSV is read from results/.
+    """
+    FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Identify first and last date of data
-earliest_date = df["month"].min().strftime("%B %Y")
-latest_date = df["month"].max().strftime("%B %Y")
+    # Set context and style
+    sns.set_style("whitegrid")
+    sns.set_context("notebook")
 
-plt.figure(figsize=(9, 5))
+    # Load data
+    df = read_result(RESULT_NAME) if df is None else df.copy()
+    count("rows_in", len(df))
+    if df.empty:
+        print(f"No rows in {RESULT_NAME}, skipping {OUTPUT_FILE.name}")
+        return
 
-ax = sns.lineplot(
-    data=df,
-    x="month",
-    y="cumulative_gains",
-    hue="company_name",
-    marker="o",
-    markersize=4
-)
+    # Generate cumulative gains
+    df = df.sort_values(["symbol", "month"])
+    df["cumulative_gains"] = df.groupby("symbol")["nr_net_gains"].cumsum()
 
-ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y %b"))
+    # Identify first and last date of data
+    earliest_date = df["month"].min().strftime("%B %Y")
+    latest_date = df["month"].max().strftime("%B %Y")
 
-# Rotate x-tick labels 45 degrees
-for label in ax.get_xticklabels():
-    label.set_rotation(45)
-    label.set_horizontalalignment('right')
+    plt.figure(figsize=(9, 5))
 
-ax.yaxis.set_major_locator(MaxNLocator(integer=True, nbins=8)) # Reduce y-ticks and set to integers
+    ax = sns.lineplot(
+        data=df,
+        x="month",
+        y="cumulative_gains",
+        hue="company_name",
+        marker="o",
+        markersize=4
+    )
 
-ax.set_title("Cumulative Net Monthly Count of ±2% Days per Stock", pad=15)
+    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y %b"))
 
-ax.set_xlabel("")
-ax.set_ylabel("Cumulative Net ±2% Days")
-
-ax.legend(loc='center left', bbox_to_anchor=(1, 0.5), title="")
-
-ax.figure.text(
-    0.01, -0.2,
-    "Note:\n"
-    "This figure illustrates the cumulative monthly net count of days where a stock's open-to-close return exceeded +2% minus the number of days where it fell below −2%, based on the most recent 36 full calendar months. "
-    "If an API key is provided, the data updates dynamically and includes the most recent 36 months. "
-    f"The current dataset spans from {earliest_date} to {latest_date}.",
-    wrap=True,
-    horizontalalignment='left',
-    fontsize=10
-)
-
-plt.show()
-
-ax.figure.savefig(OUTPUT_FILE, dpi=300, bbox_inches="tight")
+    # Rotate x-tick labels 45 degrees
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
 
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True, nbins=8)) # Reduce y-ticks and set to integers
 
+    ax.set_title("Cumulative Net Monthly Count of ±2% Days per Stock", pad=15)
 
+    ax.set_xlabel("")
+    ax.set_ylabel("Cumulative Net ±2% Days")
 
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5), title="")
 
+    ax.figure.text(
+        0.01, -0.2,
+        "Note:\n"
+        "This figure illustrates the cumulative monthly net count of days where a stock's open-to-close return exceeded +2% minus the number of days where it fell below −2%, based on the most recent 36 full calendar months. "
+        "If an API key is provided, the data updates dynamically and includes the most recent 36 months. "
+        f"The current dataset spans from {earliest_date} to {latest_date}.",
+        wrap=True,
+        horizontalalignment='left',
+        fontsize=10
+    )
 
+    save_figure(ax.figure, OUTPUT_FILE, formats, dpi, show)
 
 
+if __name__ == "__main__":
+    run_script(main, "Plot cumulative 2% net gain counts.")
@@ -1,8 +1,10 @@
 from pathlib import Path
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
+from figure_output import DEFAULT_DPI, DEFAULT_FORMATS, run_script, save_figure
+from instrumentation import count
+from query_results import read_result
 
 #===============================================================
 #         VISUALIZE STOCK VOLATILITY (LAST 6 MONTHS)
@@ -18,57 +20,67 @@ if BASE_DIR.name == "scripts": # Move up one level
     BASE_DIR = BASE_DIR.parent
     
     
-# Manage paths
-RESULTS_DIR = BASE_DIR / "results"
+# Query result plotted and output path
+RESULT_NAME = "stock_volatility_last_6_months"
 FIGURES_DIR = BASE_DIR / "figures"
-DATA_FILE = RESULTS_DIR / "stock_volatility_last_6_months.csv"
 OUTPUT_FILE = FIGURES_DIR / "stock_volatility_last_6_months.png"
-FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Set context and style
-sns.set_style("darkgrid")
-sns.set_context("notebook")
 
+def main(df=None, formats=DEFAULT_FORMATS, dpi=DEFAULT_DPI, show=True):
+    """Plot the query result and save the figure in each of `formats`.
 
-# Load data
-df = pd.read_csv(DATA_FILE)
+    `df` is the result as returned by run_queries.py; without it the saved
+    CSV is read from results/.
+    """
+    FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Identify first and last date of data
-df["month"] = pd.to_datetime(df["month"])
-earliest_month = df["month"].min().strftime("%B %Y")
-latest_month = df["month"].max().strftime("%B %Y")
+    # Set context and style
+    sns.set_style("darkgrid")
+    sns.set_context("notebook")
 
-plt.figure(figsize=(8, 5))
 
-ax = sns.lineplot(
-    data=df,
-    x="month",
-    y="avg_daily_return",
-    hue="company_name",
-    marker="o",
-    markersize=8
-)
+    # Load data
+    df = read_result(RESULT_NAME) if df is None else df.copy()
+    count("rows_in", len(df))
+    if df.empty:
+        print(f"No rows in {RESULT_NAME}, skipping {OUTPUT_FILE.name}")
+        return
 
-ax.xaxis.set_major_formatter(mdates.DateFormatter("%b"))
-ax.set_title("Average Daily Return by Month (%)", pad=15, fontsize=16)
-ax.set_xlabel("")
-ax.set_ylabel("Percent")
-ax.legend(title="")
+    # Identify first and last date of data
+    earliest_month = df["month"].min().strftime("%B %Y")
+    latest_month = df["month"].max().strftime("%B %Y")
 
-ax.figure.text(
-    0.01, -0.08,
-    "Note:\n"
-    "This figure shows the average daily return for each stock, measured as the percentage change from open to close, over the most recent six full calendar months. "
-    "If an API key is provided, the data updates dynamically. "
-    f"The current dataset spans from {earliest_month} to {latest_month}.",
-    wrap=True,
-    horizontalalignment='left',
-    fontsize=10
-)
+    plt.figure(figsize=(8, 5))
 
+    ax = sns.lineplot(
+        data=df,
+        x="month",
+        y="avg_daily_return",
+        hue="company_name",
+        marker="o",
+        markersize=8
+    )
 
-plt.show()
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b"))
+    ax.set_title("Average Daily Return by Month (%)", pad=15, fontsize=16)
+    ax.set_xlabel("")
+    ax.set_ylabel("Percent")
+    ax.legend(title="")
 
-ax.figure.savefig(OUTPUT_FILE, dpi=300, bbox_inches="tight")
+    ax.figure.text(
+        0.01, -0.08,
+        "Note:\n"
+        "This figure shows the average daily return for each stock, measured as the percentage change from open to close, over the most recent six full calendar months. "
+        "If an API key is provided, the data updates dynamically. "
+        f"The current dataset spans from {earliest_month} to {latest_month}.",
+        wrap=True,
+        horizontalalignment='left',
+        fontsize=10
+    )
 
 
+    save_figure(ax.figure, OUTPUT_FILE, formats, dpi, show)
+
+
+if __name__ == "__main__":
+    run_script(main, "Plot stock volatility (last 6 months).")
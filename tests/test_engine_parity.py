@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+import subprocess
+import sys
+from benchmark_pipeline import make_project_copy
+import analytics
+
+
+def run_script(project, *args):
+    return subprocess.run([sys.executable, str(project / "scripts" / args[0]), *args[1:]], cwd=project,
+                          capture_output=True, text=True)
+
+
+def test_sql_and_pandas_engines_agree_on_synthetic_data(tmp_path):
+    project = make_project_copy(tmp_path / "project")
+    # stock_volatility_last_6_months keeps the last six months before DATE('now'),
+    # so the data must end today (UTC, as in SQLite) for every query to return rows
+    end_date = datetime.now(timezone.utc).date().isoformat()
+    for args in [("generate_synthetic_data.py", "--symbols", "5", "--years", "3", "--quarters", "12",
+                  "--end-date", end_date),
+                 ("load_to_db.py",)]:
+        completed = run_script(project, *args)
+        assert completed.returncode == 0, completed.stderr
+
+    completed = run_script(project, "run_queries.py", "--check-parity", "--require-rows")
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    for query_file in analytics.ANALYSES:
+        assert f"OK       {query_file}" in completed.stdout
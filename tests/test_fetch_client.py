@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from av_client import (DATA, INVALID_SYMBOL, THROTTLED, DailyQuota, QuotaExceededError, QuotaLedger, TokenBucket,
+                       classify_response, is_daily_limit)
+from benchmark_pipeline import make_project_copy
+from mock_alpha_vantage import MockSettings, make_server
+
+DATASETS = ["annual_earnings", "balance_sheets", "company_overviews", "income_statements", "quarterly_earnings",
+            "stock_prices"]
+
+
+#==================================================
+#             RATE LIMITS AND REPLIES
+#==================================================
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_spaces_requests_evenly():
+    clock = FakeClock()
+    bucket = TokenBucket(5, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == pytest.approx([12.0, 12.0])
+
+
+def test_daily_quota_resets_on_a_new_day():
+    day = [date(2026, 1, 5)]
+    quota = DailyQuota(2, today=lambda: day[0])
+    quota.acquire()
+    quota.acquire()
+    with pytest.raises(QuotaExceededError):
+        quota.acquire()
+    day[0] += timedelta(days=1)
+    quota.acquire()
+    assert quota.remaining == 1
+
+
+def test_daily_quota_is_shared_through_the_ledger(tmp_path):
+    today = date(2026, 1, 5)
+    quotas = [DailyQuota(3, today=lambda: today, ledger=QuotaLedger(tmp_path, "key")) for _ in range(2)]
+    for quota in [quotas[0], quotas[1], quotas[0]]:
+        quota.acquire()
+    with pytest.raises(QuotaExceededError):
+        quotas[1].acquire()
+    assert QuotaLedger(tmp_path, "key").used(today) == 3
+    assert QuotaLedger(tmp_path, "other key").used(today) == 0
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ({"Time Series (Daily)": {}}, DATA),
+    ({"Note": "Our standard API call frequency is 5 calls per minute"}, THROTTLED),
+    ({"Information": "You have reached the Rate Limit of 25 requests Per Day"}, THROTTLED),
+    ({"Information": "This is a premium endpoint"}, INVALID_SYMBOL),
+    ({"Error Message": "Invalid API call"}, INVALID_SYMBOL),
+    ({}, INVALID_SYMBOL),
+])
+def test_classify_response(reply, expected):
+    assert classify_response(reply) == expected
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("You have reached the Rate Limit of 25 requests Per Day", True),
+    ("Our standard API rate limit is 25 requests per day.", True),
+    ("Our standard API call frequency is 5 calls per minute and 500 calls per day.", False),
+    ("Please spread out your requests: 5 calls Per Minute", False),
+])
+def test_is_daily_limit_ignores_case(message, expected):
+    assert is_daily_limit(message) == expected
+
+
+#==================================================
+#          FETCH_ALL AGAINST THE MOCK SERVER
+#==================================================
+
+@contextmanager
+def mock_server(**settings):
+    server = make_server(port=0, settings=MockSettings(latency=0, jitter=0, rate_limit=0, years=2, quarters=8,
+                                                       **settings))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_fetch_all(project, server, max_retries=4):
+    env = {**os.environ,
+           "ALPHA_VANTAGE_API_KEY": "",
+           "ALPHA_VANTAGE_API_KEYS": "test",
+           "ALPHA_VANTAGE_BASE_URL": f"http://127.0.0.1:{server.server_port}/query",
+           "ALPHA_VANTAGE_REQUESTS_PER_MINUTE": "0",
+           "ALPHA_VANTAGE_REQUESTS_PER_DAY": "0",
+           "ALPHA_VANTAGE_MAX_RETRIES": str(max_retries),
+           "ALPHA_VANTAGE_BACKOFF_SECONDS": "0"}
+    return subprocess.run([sys.executable, str(project / "scripts" / "fetch_all.py"), "--no-cache"], cwd=project,
+                          env=env, capture_output=True, text=True, timeout=300)
+
+
+def read_outputs(project):
+    return {name: (project / "data" / f"{name}.csv").read_bytes() for name in DATASETS}
+
+
+@pytest.fixture(scope="module")
+def clean_run(tmp_path_factory):
+    """Datasets of an undisturbed single-process run, and the number of requests it made."""
+    project = make_project_copy(tmp_path_factory.mktemp("clean"))
+    with mock_server() as server:
+        completed = run_fetch_all(project, server)
+    assert completed.returncode == 0, completed.stderr
+    return read_outputs(project), sum(server.settings.stats.values())
+
+
+def test_fetch_all_writes_every_symbol(clean_run):
+    outputs, requests_made = clean_run
+    assert requests_made == 5 * 4  # Five endpoints for the four default symbols
+    for name, content in outputs.items():
+        symbols = {line.split(",")[0] for line in content.decode().splitlines()[1:]}
+        assert symbols == {"JNJ", "PFE", "UNH", "MDT"}, name
+
+
+def test_throttled_and_failed_requests_are_retried(tmp_path, clean_run):
+    project = make_project_copy(tmp_path)
+    with mock_server(note_rate=0.2, failure_rate=0.2, seed=1) as server:
+        completed = run_fetch_all(project, server, max_retries=20)
+    assert completed.returncode == 0, completed.stderr
+    assert server.settings.stats["note"] > 0 and server.settings.stats["fail"] > 0
+    assert read_outputs(project) == clean_run[0]
+
+
+def test_rerun_resumes_after_failures(tmp_path, clean_run):
+    project = make_project_copy(tmp_path)
+    with mock_server(failure_rate=0.3, seed=2) as server:
+        completed = run_fetch_all(project, server, max_retries=0)
+    assert "Unfinished families" in completed.stdout
+    assert server.settings.stats["fail"] > 0
+    checkpointed = server.settings.stats["ok"]
+
+    with mock_server() as server:
+        completed = run_fetch_all(project, server)
+    assert completed.returncode == 0, completed.stderr
+    assert "Resuming an unfinished run" in completed.stdout
+    # Only the responses missing from the checkpoints are requested again
+    assert sum(server.settings.stats.values()) == clean_run[1] - checkpointed
+    assert read_outputs(project) == clean_run[0]
+    assert not (project / "cache" / "checkpoints").exists()